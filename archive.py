@@ -0,0 +1,57 @@
+"""Archives du planning.
+
+Les projets terminés (date de fin passée, au moins une tâche et toutes à 100%) et les tâches
+terminées depuis plusieurs semaines sont déplacés dans un fichier séparé,
+`archive.json`. Ce fichier n'est jamais lu au démarrage : il n'est ouvert que
+lorsque l'utilisateur consulte la vue « Archives ».
+"""
+from datetime import datetime, timedelta
+
+from tinydb import TinyDB
+
+from storage import AtomicJSONStorage
+
+
+# Fonction pour savoir si un projet entier peut être archivé
+def is_project_archivable(project, now):
+    """Un projet est archivable si sa date de fin est passée et toutes ses tâches sont à 100%.
+    Un projet sans tâche n'est jamais archivé automatiquement (rien n'indique qu'il est terminé).
+    """
+    tasks = project.get("tasks", [])
+    return project["end_date"] < now and bool(tasks) and all(t.get("progress", "0%") == "100%" for t in tasks)
+
+
+# Fonction pour savoir si une tâche terminée est assez ancienne pour être archivée
+def is_task_archivable(task, now, task_age_weeks):
+    """Une tâche est archivable si elle est à 100% et échue depuis plus de `task_age_weeks` semaines.
+    Les séries récurrentes restent dans le planning (leurs occurrences sont calculées à l'affichage).
+    """
+    if task.get("recurrence"):
+        return False
+    return task.get("progress", "0%") == "100%" and task["due_date"] < now - timedelta(weeks=task_age_weeks)
+
+
+class ArchiveStore:
+    """Fichier d'archives, ouvert uniquement à la demande"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _open(self):
+        return TinyDB(self.path, storage=AtomicJSONStorage)
+
+    def add(self, project_docs, task_docs):
+        """Ajoute des projets et des tâches (documents JSON) aux archives"""
+        if not project_docs and not task_docs:
+            return
+        archived_at = datetime.now().isoformat()
+        db = self._open()
+        if project_docs:
+            db.table("projects").insert_multiple([dict(doc, archived_at=archived_at) for doc in project_docs])
+        if task_docs:
+            db.table("tasks").insert_multiple([dict(doc, archived_at=archived_at) for doc in task_docs])
+
+    def load(self):
+        """Retourne (projets archivés, tâches archivées) sous forme de documents JSON"""
+        db = self._open()
+        return db.table("projects").all(), db.table("tasks").all()
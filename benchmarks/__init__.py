@@ -0,0 +1 @@
+"""Benchmarks du planning Obeya (voir `python -m benchmarks.run --help`)."""
@@ -0,0 +1,334 @@
+"""Test de charge : plusieurs sessions simulées sur un même processus Streamlit.
+
+Usage (depuis la racine du dépôt) :
+
+    python -m benchmarks.load                                 # 5 sessions, 50 projets
+    python -m benchmarks.load --sessions 20 --rounds 30 --projects 200
+    python -m benchmarks.load --sessions 10 --think 30        # délai de réflexion des utilisateurs
+
+Chaque session est un `AppTest` (`streamlit.testing.v1`) sur une copie de
+`planning_gui.py` placée dans un dossier temporaire avec une base synthétique :
+comme dans un vrai processus, les sessions partagent le modèle du planning
+(`st.cache_resource`) et gardent chacune leur `session_state`. À chaque tour, les
+sessions jouent dans un ordre aléatoire une action réaliste : changement de filtre,
+ajout d'une tâche (➕) ou import Excel (aperçu 🔍 puis confirmation).
+
+`AppTest` installe un runtime global le temps d'un passage : les passages sont donc
+joués l'un après l'autre, ce qui correspond au cas d'un processus limité par le GIL
+(les passages du script sont du calcul Python). Le rapport donne :
+
+- les percentiles de durée d'un passage (rerun) par action, mesurés sans traçage ;
+- la mémoire par session (`tracemalloc` pendant l'ouverture des sessions ; majorant,
+  l'arbre d'éléments gardé par `AppTest` est compté) et la mémoire retenue par
+  passage après l'endurance (indicateur de fuite) ;
+- le nombre d'écritures disque de la `SaveQueue` face aux validations acceptées ;
+- une estimation du nombre de sessions par processus : charge CPU de 70 % pour un
+  délai de réflexion donné (`--think`) entre deux actions d'un utilisateur.
+
+Aucune modification ne doit être perdue : chaque ajout ou import accepté doit se
+retrouver dans la base relue sur disque, et un refus pour conflit doit avoir été
+signalé à la session. Le code de sortie vaut 1 sinon.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime
+from io import BytesIO
+
+from streamlit.testing.v1 import AppTest
+
+import board_model
+from benchmarks.synthetic import generate_board, generate_task_workbook
+from board_model import load_projects_from_db, save_projects_to_db
+from planning import PROJECT_STATUSES, TASK_CATEGORIES, parse_task_rows
+from save_queue import SaveQueue
+from storage import db_filename, flush_storage, open_db, storage_config_from_env
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "planning_gui.py")
+
+# Répartition des actions d'une session
+ACTIONS = ["filter", "add_task", "import"]
+ACTION_WEIGHTS = [50, 35, 15]
+
+# Message affiché à la session dont la sauvegarde est refusée (voir sync_db)
+CONFLICT_MARKER = "modifié par un autre utilisateur"
+
+
+class _TrackedSaveQueue(SaveQueue):
+    """File d'écriture relevée par le banc (nombre d'écritures, attente de fin)"""
+
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _TrackedSaveQueue.instances.append(self)
+
+
+def percentiles(durations):
+    """Retourne les percentiles 50 / 90 / 99 et le maximum d'une liste de durées"""
+    ordered = sorted(durations)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+        "mean": statistics.mean(ordered),
+    }
+
+
+class Outcomes:
+    """Modifications acceptées (à retrouver sur disque) et refus signalés pour conflit"""
+
+    def __init__(self):
+        self.expected = defaultdict(set)  # projet → noms de tâches acceptées
+        self.counts = Counter()  # validations acceptées, conflits
+
+    def record(self, session, pid, names):
+        if session.conflicted():
+            self.counts["conflicts"] += 1
+        else:
+            self.counts["accepted"] += 1
+            self.expected[pid].update(names)
+
+
+class Session:
+    """Un utilisateur simulé : un AppTest et les modifications qu'il a fait accepter"""
+
+    def __init__(self, number, script, timeout):
+        self.number = number
+        self.app = AppTest.from_file(script, default_timeout=timeout)
+        self.added = 0
+
+    def run(self, action, latencies):
+        start = time.perf_counter()
+        self.app.run()
+        latencies[action].append(time.perf_counter() - start)
+        if self.app.exception:
+            raise RuntimeError(f"session {self.number} ({action}) : {self.app.exception[0].value}")
+
+    def conflicted(self):
+        return any(CONFLICT_MARKER in w.value for w in self.app.warning)
+
+    def project_ids(self):
+        # Projets dont la popover est affichée avec les filtres de la session
+        return [b.key[len("add_task_"):] for b in self.app.button if b.key and b.key.startswith("add_task_")]
+
+    def change_filter(self, rng, latencies):
+        categories = rng.sample(TASK_CATEGORIES, rng.randint(1, len(TASK_CATEGORIES)))
+        self.app.multiselect(key="filter_categories_selector").set_value(categories)
+        # Le filtre d'états masque parfois des projets (moins de popovers affichées)
+        statuses = list(PROJECT_STATUSES) if rng.random() < 0.7 else rng.sample(PROJECT_STATUSES, rng.randint(2, len(PROJECT_STATUSES)))
+        self.app.multiselect(key="filter_statuses_selector").set_value(statuses)
+        self.run("filter", latencies)
+
+    def add_task(self, rng, latencies, outcomes):
+        project_ids = self.project_ids()
+        if not project_ids:
+            return self.change_filter(rng, latencies)
+        pid = rng.choice(project_ids)
+        self.added += 1
+        name = f"Charge {self.number}-{self.added}"
+        name_input = next(t for t in self.app.text_input if t.key and t.key.startswith(f"task_name_{pid}_"))
+        name_input.set_value(name)
+        self.app.button(key=f"add_task_{pid}").click()
+        self.run("add_task", latencies)
+        outcomes.record(self, pid, {name})
+
+    def import_workbook(self, rng, latencies, workbooks, outcomes):
+        project_ids = self.project_ids()
+        if not project_ids:
+            return self.change_filter(rng, latencies)
+        pid = rng.choice(project_ids)
+        filename, data, names = rng.choice(workbooks)
+        self.app.file_uploader(key=f"upload_excel_{pid}").upload(filename, data)
+        self.app.button(key=f"import_tasks_{pid}").click()
+        self.run("import_preview", latencies)
+        self.app.button(key=f"confirm_import_{pid}").click()
+        self.run("import_confirm", latencies)
+        outcomes.record(self, pid, names)
+        # Retirer le fichier comme le ferait l'utilisateur (sinon il reste envoyé à chaque passage)
+        self.app.file_uploader(key=f"upload_excel_{pid}").set_value(None)
+        self.run("import_clear", latencies)
+
+    def act(self, rng, latencies, workbooks, outcomes):
+        action = rng.choices(ACTIONS, ACTION_WEIGHTS)[0]
+        if action == "filter":
+            self.change_filter(rng, latencies)
+        elif action == "add_task":
+            self.add_task(rng, latencies, outcomes)
+        else:
+            self.import_workbook(rng, latencies, workbooks, outcomes)
+
+
+def _traced_bytes():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def run_load(args):
+    """Joue la charge décrite par `args` et retourne le rapport (dict)"""
+    rng = random.Random(args.seed)
+    now = datetime.combine(datetime.now().date(), datetime.min.time())
+    config = storage_config_from_env(os.environ)
+    board_model.SaveQueue = _TrackedSaveQueue
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Base synthétique et copie du script : les fichiers du planning sont créés à côté
+        script = os.path.join(tmp, "planning_gui.py")
+        shutil.copy(APP_SCRIPT, script)
+        db_path = os.path.join(tmp, db_filename(config))
+        db = open_db(db_path, config._replace(caching=False))
+        save_projects_to_db(db.table("projects"), generate_board(args.projects, args.tasks, seed=args.seed, now=now))
+        db.close()
+
+        workbooks = []
+        for i in range(args.workbooks):
+            data = generate_task_workbook(args.workbook_rows, seed=args.seed + i, now=now, name_prefix=f"Import {i + 1}").getvalue()
+            names = {row["name"] for row in parse_task_rows(BytesIO(data))}
+            workbooks.append((f"import-{i + 1}.xlsx", data, names))
+
+        latencies = defaultdict(list)
+        outcomes = Outcomes()
+
+        # Ouverture des sessions sous tracemalloc : la première charge le planning partagé
+        tracemalloc.start()
+        base = _traced_bytes()
+        sessions = [Session(i + 1, script, args.timeout) for i in range(args.sessions)]
+        sessions[0].run("open_first", latencies)
+        after_first = _traced_bytes()
+        for session in sessions[1:]:
+            session.run("open", latencies)
+        after_all = _traced_bytes()
+        tracemalloc.stop()
+        latencies.pop("open", None)  # mesurées sous traçage, non représentatives
+
+        # Endurance : chaque tour, toutes les sessions jouent une action dans un ordre aléatoire
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            order = list(sessions)
+            rng.shuffle(order)
+            for session in order:
+                session.act(rng, latencies, workbooks, outcomes)
+        soak_seconds = time.perf_counter() - start
+
+        # Mémoire retenue après un tour supplémentaire (indicateur de fuite)
+        tracemalloc.start()
+        before_round = _traced_bytes()
+        traced_latencies = defaultdict(list)
+        for session in sessions:
+            session.act(rng, traced_latencies, workbooks, outcomes)
+        retained = _traced_bytes() - before_round
+        tracemalloc.stop()
+        traced_runs = sum(len(v) for v in traced_latencies.values())
+
+        queues = list(_TrackedSaveQueue.instances)
+        for queue in queues:
+            if not queue.flush(timeout=args.timeout):
+                raise RuntimeError(f"écritures non terminées après {args.timeout:g} s : {queue.last_error}")
+
+        # Relire la base sur disque : toute modification acceptée doit y être
+        db = open_db(db_path, config._replace(caching=False))
+        on_disk = {p["id"]: {t["name"] for t in p["tasks"]} for p in load_projects_from_db(db.table("projects"))}
+        flush_storage(db.storage)
+        db.close()
+        lost = {pid: sorted(names - on_disk.get(pid, set())) for pid, names in outcomes.expected.items() if names - on_disk.get(pid, set())}
+
+    board_model.SaveQueue = SaveQueue
+    soak = [d for action, durations in latencies.items() if action != "open_first" for d in durations]
+    mean = statistics.mean(soak)
+    return {
+        "latency": {action: percentiles(durations) for action, durations in sorted(latencies.items())},
+        "latency_all": percentiles(soak),
+        "reruns_per_second": len(soak) / soak_seconds,
+        "memory": {
+            "shared_and_first_session": after_first - base,
+            "per_session": (after_all - after_first) / (len(sessions) - 1) if len(sessions) > 1 else None,
+            "retained_per_rerun": retained / traced_runs if traced_runs else None,
+        },
+        "accepted_edits": outcomes.counts["accepted"],
+        "conflicts": outcomes.counts["conflicts"],
+        "save_queue_writes": sum(queue.writes for queue in queues),
+        "lost_edits": lost,
+        # Charge CPU de 70 % : K · durée / (réflexion + durée) = 0,7
+        "sessions_capacity": 0.7 * (args.think + mean) / mean,
+    }
+
+
+def _mb(size):
+    return f"{size / 1e6:.2f} Mo" if size is not None else "-"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge multi-sessions du planning Obeya")
+    parser.add_argument("--sessions", type=int, default=5, help="sessions simultanées")
+    parser.add_argument("--rounds", type=int, default=10, help="actions par session")
+    parser.add_argument("--projects", type=int, default=50, help="projets de la base synthétique")
+    parser.add_argument("--tasks", type=int, default=20, help="tâches par projet (moyenne)")
+    parser.add_argument("--workbooks", type=int, default=3, help="classeurs différents importés")
+    parser.add_argument("--workbook-rows", type=int, default=20, help="lignes par classeur importé")
+    parser.add_argument("--think", type=float, default=10.0, help="délai de réflexion entre deux actions (s)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="durée maximale d'un passage ou de l'écriture finale (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    if args.sessions < 1:
+        parser.error("--sessions doit valoir au moins 1")
+
+    report = run_load(args)
+    for action, stats in report["latency"].items():
+        print(f"{action:16s} n={stats['count']:4d}  p50 {stats['p50'] * 1000:8.1f} ms  p90 {stats['p90'] * 1000:8.1f} ms"
+              f"  p99 {stats['p99'] * 1000:8.1f} ms  max {stats['max'] * 1000:8.1f} ms")
+    overall = report["latency_all"]
+    print(f"{'tous passages':16s} n={overall['count']:4d}  p50 {overall['p50'] * 1000:8.1f} ms  p90 {overall['p90'] * 1000:8.1f} ms"
+          f"  p99 {overall['p99'] * 1000:8.1f} ms  ({report['reruns_per_second']:.1f} passages/s)")
+    memory = report["memory"]
+    print(f"Mémoire : planning partagé + 1re session {_mb(memory['shared_and_first_session'])}, "
+          f"par session {_mb(memory['per_session'])}, retenue par passage {_mb(memory['retained_per_rerun'])}")
+    print(f"Écritures : {report['accepted_edits']} validation(s) acceptée(s), {report['conflicts']} conflit(s) signalé(s), "
+          f"{report['save_queue_writes']} écriture(s) disque")
+    print(f"Capacité estimée : {report['sessions_capacity']:.0f} session(s) par processus "
+          f"(réflexion {args.think:g} s, charge CPU 70 %)")
+    if report["lost_edits"]:
+        print(f"⚠️ Modifications perdues : {report['lost_edits']}")
+    else:
+        print("Aucune modification perdue.")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump({
+            "meta": {
+                "date": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "sessions": args.sessions,
+                "rounds": args.rounds,
+                "projects": args.projects,
+                "tasks_per_project": args.tasks,
+                "think": args.think,
+                "seed": args.seed,
+            },
+            "results": report,
+        }, handle, indent=2)
+    print(f"Résultats écrits dans {output}")
+    return 1 if report["lost_edits"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
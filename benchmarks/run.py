@@ -0,0 +1,199 @@
+"""Mesure les chemins critiques du planning sur des plannings synthétiques.
+
+Usage (depuis la racine du dépôt) :
+
+    python -m benchmarks.run                          # 10 / 100 / 1000 projets
+    python -m benchmarks.run --sizes 10 100 --repeat 3
+    python -m benchmarks.run --compare benchmarks/results/reference.json
+
+Les résultats sont écrits en JSON (par défaut dans `benchmarks/results/`). Avec
+`--compare`, chaque médiane est comparée à celle du fichier de référence et le
+code de sortie vaut 1 si une mesure est plus lente que le seuil toléré.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from tinydb import TinyDB
+
+from benchmarks.synthetic import generate_board, generate_task_workbook
+from board_model import load_projects_from_db, project_to_doc, save_projects_to_db, write_project_docs
+from excel_import import ParseCache, preview_frame
+from schedule import ScheduleEngine
+from planning import (
+    TASK_CATEGORIES,
+    build_planning_grid,
+    build_timeline,
+    date_to_period_index,
+    render_planning_html,
+)
+from storage import AtomicJSONStorage, StorageConfig, db_filename, msgpack, open_db, orjson
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Formats de base comparés (les sérialiseurs facultatifs absents sont ignorés)
+STORAGE_CONFIGS = [
+    ("json", StorageConfig("json", None, False)),
+    ("json+cache", StorageConfig("json", None, True)),
+    ("orjson+cache", StorageConfig("orjson", None, True)),
+    ("orjson+gzip+cache", StorageConfig("orjson", "gzip", True)),
+    ("msgpack+cache", StorageConfig("msgpack", None, True)),
+    ("msgpack+gzip+cache", StorageConfig("msgpack", "gzip", True)),
+]
+
+
+def measure(fn, repeat):
+    """Exécute `fn` `repeat` fois et retourne les statistiques en secondes"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+    }
+
+
+def bench_size(n_projects, tasks_per_project, workbook_rows, repeat, seed, now, recurring=0, links=1.0):
+    """Retourne {nom du benchmark: statistiques} pour une taille de planning"""
+    projects = generate_board(n_projects, tasks_per_project, seed=seed, now=now, recurring_per_project=recurring)
+    project_index = {p["id"]: p for p in projects}
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        table = TinyDB(os.path.join(tmp, "db.json"), storage=AtomicJSONStorage).table("projects")
+        save_projects_to_db(table, projects)
+        results["load_projects_from_db"] = measure(lambda: load_projects_from_db(table), repeat)
+        results["save_projects_to_db"] = measure(lambda: save_projects_to_db(table, projects), repeat)
+
+        # Démarrage (lecture complète) et sauvegarde d'un projet modifié, par format de base
+        docs = {str(i + 1): project_to_doc(p) for i, p in enumerate(projects)}
+        for label, config in STORAGE_CONFIGS:
+            if (config.serializer == "orjson" and orjson is None) or (config.serializer == "msgpack" and msgpack is None):
+                continue
+            path = os.path.join(tmp, db_filename(config, stem=f"db-{label}"))
+            open_db(path, config._replace(caching=False)).storage.write({"projects": docs})
+            results[f"storage_load[{label}]"] = measure(lambda: open_db(path, config).table("projects").all(), repeat)
+            storage = open_db(path, config).storage
+            storage.read()  # cache chargé comme après le démarrage
+            results[f"storage_save[{label}]"] = measure(lambda: write_project_docs(storage, {"1": docs["1"]}), repeat)
+
+    results["build_timeline"] = measure(lambda: build_timeline(now), repeat)
+    period_labels, _, period_starts, period_ends = build_timeline(now)
+
+    # Toutes les dates placées dans la frise lors d'un rendu (projets et tâches)
+    dates = [d for p in projects for d in [p["start_date"], p["end_date"]] + [t["due_date"] for t in p["tasks"]]]
+    results["date_to_period_index"] = measure(
+        lambda: [date_to_period_index(d, period_labels, period_starts, period_ends) for d in dates], repeat
+    )
+
+    results["build_planning_grid"] = measure(
+        lambda: build_planning_grid(projects, TASK_CATEGORIES, period_labels, period_starts, period_ends, now=now), repeat
+    )
+    grid = build_planning_grid(projects, TASK_CATEGORIES, period_labels, period_starts, period_ends, now=now)
+    results["render_planning_html"] = measure(
+        lambda: render_planning_html(grid, project_index, TASK_CATEGORIES, period_labels, today=now), repeat
+    )
+
+    # Chemin critique : calcul complet puis recalcul après le décalage d'une échéance (projet du milieu)
+    linked = generate_board(n_projects, tasks_per_project, seed=seed, now=now, links_per_task=links)
+    engine = ScheduleEngine()
+    results["schedule_rebuild"] = measure(lambda: engine.rebuild(linked, now), repeat)
+    middle = linked[len(linked) // 2]
+    moved = dict(middle, tasks=[dict(t) for t in middle["tasks"]])
+
+    def update():
+        if moved["tasks"]:
+            moved["tasks"][0]["due_date"] += timedelta(days=1)
+        engine.update({moved["id"]: moved})
+
+    results["schedule_update"] = measure(update, repeat)
+
+    # Import Excel tel que l'application le fait : empreinte du fichier puis lecture (cache vide)
+    data = generate_task_workbook(workbook_rows, seed=seed, now=now).getvalue()
+    results["import_parse"] = measure(lambda: ParseCache().parse(data, "Model Tache"), repeat)
+
+    # Aperçu d'un classeur déjà lu : empreinte du fichier, lecture en cache et doublons
+    cache = ParseCache()
+    cache.parse(data, "Model Tache")
+    existing = projects[0]["tasks"] if projects else []
+    results["import_preview_cached"] = measure(
+        lambda: preview_frame(cache.get(cache.parse(data, "Model Tache")), existing), repeat
+    )
+    return results
+
+
+def compare(results, reference, threshold):
+    """Affiche le rapport médiane courante / médiane de référence et retourne les régressions"""
+    regressions = []
+    for key, stats in sorted(results.items()):
+        if key not in reference:
+            continue
+        ratio = stats["median"] / reference[key]["median"] if reference[key]["median"] else float("inf")
+        flag = "  ⚠️ régression" if ratio > threshold else ""
+        print(f"{key:40s} {reference[key]['median'] * 1000:10.2f} ms → {stats['median'] * 1000:10.2f} ms  x{ratio:.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du planning Obeya")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="nombres de projets")
+    parser.add_argument("--tasks", type=int, default=20, help="tâches par projet (moyenne)")
+    parser.add_argument("--links", type=float, default=1.0, help="dépendances par tâche (chemin critique)")
+    parser.add_argument("--recurring", type=int, default=0, help="séries récurrentes par projet")
+    parser.add_argument("--workbook-rows", type=int, default=None, help="lignes du classeur importé (défaut : 5 par projet)")
+    parser.add_argument("--repeat", type=int, default=5, help="répétitions par mesure")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    parser.add_argument("--compare", help="fichier JSON de référence")
+    parser.add_argument("--threshold", type=float, default=1.2, help="rapport de médianes toléré")
+    args = parser.parse_args(argv)
+
+    now = datetime.combine(datetime.now().date(), datetime.min.time())
+    results = {}
+    for size in args.sizes:
+        rows = args.workbook_rows if args.workbook_rows is not None else 5 * size
+        for name, stats in bench_size(size, args.tasks, rows, args.repeat, args.seed, now, args.recurring, args.links).items():
+            key = f"{name}@{size}"
+            results[key] = stats
+            print(f"{key:40s} médiane {stats['median'] * 1000:10.2f} ms  (min {stats['min'] * 1000:.2f} ms)")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump({
+            "meta": {
+                "date": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "tasks_per_project": args.tasks,
+                "recurring_per_project": args.recurring,
+                "links_per_task": args.links,
+                "repeat": args.repeat,
+            },
+            "results": results,
+        }, handle, indent=2)
+    print(f"Résultats écrits dans {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            reference = json.load(handle)["results"]
+        if compare(results, reference, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
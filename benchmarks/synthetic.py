@@ -0,0 +1,110 @@
+"""Générateur de données synthétiques pour les benchmarks.
+
+Les tirages sont reproductibles (graine fixe) et suivent une répartition proche
+d'un vrai planning : catégories dominées par les jalons et livrables, majorité de
+tâches non démarrées, échéances réparties de -2 mois à +9 mois autour d'aujourd'hui.
+"""
+import random
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pandas as pd
+
+from planning import PROJECT_STATUSES, TASK_CATEGORIES, TASK_PROGRESS
+
+# Poids des tirages (même ordre que les listes d'options)
+CATEGORY_WEIGHTS = [30, 25, 15, 12, 10, 8]
+PROGRESS_WEIGHTS = [55, 25, 20]
+STATUS_WEIGHTS = [20, 45, 15, 10, 10]
+
+
+def _random_id(rng):
+    return f"{rng.getrandbits(128):032x}"
+
+
+def _midnight(now):
+    return datetime.combine(now.date(), datetime.min.time())
+
+
+def generate_board(n_projects, tasks_per_project=20, seed=0, now=None, recurring_per_project=0, links_per_task=0.0):
+    """Retourne `n_projects` projets (dates en datetime) d'environ `tasks_per_project` tâches.
+
+    `recurring_per_project` séries récurrentes (revues hebdomadaires, comités mensuels)
+    démarrées il y a plusieurs années sont ajoutées à chaque projet. `links_per_task`
+    est le nombre moyen de dépendances vers des tâches plus anciennes (tous projets).
+    """
+    rng = random.Random(seed)
+    today = _midnight(now or datetime.now())
+    projects = []
+    task_ids = []
+    for p in range(n_projects):
+        start = today + timedelta(days=rng.randint(-180, 60))
+        end = start + timedelta(days=rng.randint(30, 400))
+        tasks = []
+        for t in range(max(0, int(rng.gauss(tasks_per_project, tasks_per_project / 4)))):
+            tasks.append({
+                "id": _random_id(rng),
+                "name": f"Tâche {p + 1}.{t + 1}",
+                "category": rng.choices(TASK_CATEGORIES, CATEGORY_WEIGHTS)[0],
+                "due_date": today + timedelta(days=rng.randint(-60, 270)),
+                "progress": rng.choices(TASK_PROGRESS, PROGRESS_WEIGHTS)[0],
+            })
+            # Les liens ne visent que des tâches déjà créées : le graphe reste sans cycle
+            links = int(links_per_task) + (rng.random() < links_per_task % 1)
+            if task_ids and links:
+                tasks[-1]["depends_on"] = sorted({rng.choice(task_ids) for _ in range(links)})
+            task_ids.append(tasks[-1]["id"])
+        for r in range(recurring_per_project):
+            first = today - timedelta(days=rng.randint(365, 5 * 365))
+            if r % 2 == 0:
+                rule = {"freq": "weekly", "interval": rng.choice([1, 2]), "day": None, "until": None}
+            else:
+                rule = {"freq": "monthly", "interval": 1, "day": first.day, "until": None}
+            tasks.append({
+                "id": _random_id(rng),
+                "name": f"Revue {p + 1}.{r + 1}",
+                "category": "Jalon",
+                "due_date": first,
+                "progress": "0%",
+                "recurrence": rule,
+                # Quelques occurrences passées déjà renseignées
+                "occurrences": {(today - timedelta(weeks=w)).date().isoformat(): "100%" for w in range(1, 4)},
+            })
+        projects.append({
+            "id": _random_id(rng),
+            "name": f"Projet {p + 1:04d}",
+            "start_date": start,
+            "end_date": end,
+            "status": rng.choices(PROJECT_STATUSES, STATUS_WEIGHTS)[0],
+            "tasks": tasks,
+        })
+    return projects
+
+
+def generate_task_workbook(n_rows, seed=0, now=None, sheet_name="Model Tache", name_prefix="Tâche importée"):
+    """Retourne un classeur Excel en mémoire au format « Model Tache ».
+
+    Environ 5% des lignes ont une catégorie, une date ou une progression invalide
+    pour exercer les corrections de l'import. Les tâches s'appellent
+    « `name_prefix` 1 », « `name_prefix` 2 », etc.
+    """
+    rng = random.Random(seed)
+    today = _midnight(now or datetime.now())
+    rows = []
+    for r in range(n_rows):
+        category = rng.choices(TASK_CATEGORIES, CATEGORY_WEIGHTS)[0]
+        due = today + timedelta(days=rng.randint(-60, 270))
+        progress = rng.choices(TASK_PROGRESS, PROGRESS_WEIGHTS)[0]
+        if rng.random() < 0.05:
+            category = "Divers"
+        if rng.random() < 0.05:
+            due = "à définir"
+        if rng.random() < 0.05:
+            progress = "25%"
+        rows.append({"Nom": f"{name_prefix} {r + 1}", "Catégorie": category, "Date d'échéance": due, "Progression": progress})
+    buffer = BytesIO()
+    pd.DataFrame(rows, columns=["Nom", "Catégorie", "Date d'échéance", "Progression"]).to_excel(
+        buffer, sheet_name=sheet_name, index=False, engine="openpyxl"
+    )
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,426 @@
+"""Modèle de planning partagé entre les sessions Streamlit.
+
+Le processus garde une seule copie des projets en mémoire, protégée par un verrou
+et versionnée par projet. Les sessions lisent ces objets sans jamais les modifier :
+leurs changements sont préparés dans une surcouche (copie sur écriture des seuls
+projets touchés) puis validés par `BoardModel.commit`, qui refuse d'écraser un
+projet modifié entre-temps par une autre session. Les écritures disque sont
+confiées à une `SaveQueue` qui les regroupe en arrière-plan ; elles lui sont
+remises après la libération du verrou (la file peut bloquer quand elle est pleine,
+et son thread d'écriture prend le verrou pour le résumé du planning).
+"""
+import os
+import threading
+import uuid
+from collections import deque, namedtuple
+from datetime import datetime
+
+from archive import is_project_archivable, is_task_archivable
+from journal import ARCHIVE_KIND, apply_delta, diff_project_docs
+from save_queue import SaveQueue
+from schedule import ScheduleEngine
+from storage import AtomicJSONStorage, flush_storage
+from workspaces import board_summary
+
+
+class ConflictError(Exception):
+    """Levée quand un projet a été modifié par une autre session depuis sa lecture"""
+
+    def __init__(self, project_ids):
+        self.project_ids = list(project_ids)
+        super().__init__(f"Projets modifiés par une autre session : {', '.join(self.project_ids)}")
+
+
+# Vue figée du planning : liste triée, index id → projet, versions par projet
+# et chemin critique (id tâche → ScheduleInfo, tâches liées uniquement)
+BoardSnapshot = namedtuple("BoardSnapshot", ["projects", "index", "versions", "schedule"])
+
+
+# Fonction pour générer un identifiant stable (projets et tâches)
+def new_id():
+    """Retourne un identifiant unique stable, indépendant du nom et de la position"""
+    return uuid.uuid4().hex
+
+
+# Fonction pour attribuer un identifiant aux projets et tâches qui n'en ont pas
+def ensure_ids(projects):
+    """Ajoute un champ `id` aux projets et tâches anciens. Retourne True si un id a été créé"""
+    created = False
+    for proj in projects:
+        if not proj.get("id"):
+            proj["id"] = new_id()
+            created = True
+        for task in proj.get("tasks", []):
+            if not task.get("id"):
+                task["id"] = new_id()
+                created = True
+    return created
+
+
+# Fonction pour convertir un document TinyDB en projet (dates en datetime)
+def project_from_doc(doc):
+    """Convertit un document JSON en projet avec des dates datetime"""
+    proj = dict(doc)
+    proj["start_date"] = datetime.fromisoformat(proj.get("start_date", datetime.now().isoformat()))
+    proj["end_date"] = datetime.fromisoformat(proj.get("end_date", datetime.now().isoformat()))
+    tasks = []
+    for task in proj.get("tasks") or []:
+        task = dict(task)
+        if isinstance(task.get("due_date"), str):
+            task["due_date"] = datetime.fromisoformat(task["due_date"])
+        tasks.append(task)
+    proj["tasks"] = tasks
+    return proj
+
+
+# Fonction pour convertir un projet en document TinyDB (dates en ISO)
+def project_to_doc(proj):
+    """Convertit un projet en document JSON sans modifier l'objet d'origine"""
+    doc = dict(proj)
+    doc["start_date"] = proj["start_date"].isoformat()
+    doc["end_date"] = proj["end_date"].isoformat()
+    tasks = []
+    for task in proj.get("tasks", []):
+        task = dict(task)
+        if isinstance(task.get("due_date"), datetime):
+            task["due_date"] = task["due_date"].isoformat()
+        tasks.append(task)
+    doc["tasks"] = tasks
+    return doc
+
+
+# Fonction pour copier un projet avant modification (copie sur écriture)
+def copy_project(proj):
+    """Copie le projet et ses tâches pour pouvoir les modifier sans toucher au modèle partagé"""
+    copy = dict(proj)
+    copy["tasks"] = [dict(task) for task in proj.get("tasks", [])]
+    return copy
+
+
+# Fonction pour charger les projets depuis la base de données
+def load_projects_from_db(table):
+    """Charge les projets depuis une table TinyDB et les reformate pour Streamlit"""
+    return [project_from_doc(doc) for doc in table.all()]
+
+
+# Fonction pour sauvegarder les projets dans la base de données
+def save_projects_to_db(table, projects):
+    """Réécrit toute la table TinyDB et retourne les doc_id insérés (dans l'ordre)"""
+    table.truncate()  # Vider la table
+    return table.insert_multiple([project_to_doc(proj) for proj in projects])
+
+
+# Fonction pour écrire en une fois des documents modifiés dans le stockage TinyDB
+def write_project_docs(storage, changes, table_name="projects"):
+    """Applique les documents `doc_id → document` (None = suppression) en une seule écriture.
+    Avec un CachingMiddleware, la base n'est pas relue : seul le `flush` final touche le disque.
+    """
+    data = storage.read() or {}
+    table = data.setdefault(table_name, {})
+    for doc_id, doc in changes.items():
+        if doc is None:
+            table.pop(str(doc_id), None)
+        else:
+            table[str(doc_id)] = doc
+    storage.write(data)
+    flush_storage(storage)
+
+
+class BoardModel:
+    """Planning partagé par toutes les sessions du processus"""
+
+    def __init__(self, table, write_behind=True, journal=None, summary_path=None):
+        self._table = table
+        self._journal = journal
+        self._summary_path = summary_path  # résumé pour la vue portefeuille, réécrit à chaque sauvegarde
+        self._lock = threading.RLock()
+        self._projects = {}  # id projet → projet (jamais modifié sur place)
+        self._versions = {}  # id projet → version (conservée après suppression)
+        self._doc_ids = {}  # id projet → doc_id TinyDB
+        self._snapshot = None
+        self._schedule = ScheduleEngine()
+        self._load()
+        self._next_doc_id = max(self._doc_ids.values(), default=0) + 1
+        # Le journal part de l'état chargé s'il n'a encore aucun point de reprise
+        if self._journal is not None and not self._journal.has_checkpoint():
+            self._journal.checkpoint(self._all_docs())
+        if self._summary_path and not os.path.exists(self._summary_path):
+            self._write_summary()
+        # Sans écriture différée, chaque validation écrit immédiatement
+        self._writer = SaveQueue(self._write_docs) if write_behind else None
+        self._outbox = deque()  # écritures validées, à remettre à la file hors du verrou
+        self._submit_lock = threading.Lock()  # remise dans l'ordre des validations
+
+    def _write_docs(self, changes):
+        write_project_docs(self._table.storage, changes, self._table.name)
+        if self._summary_path:
+            self._write_summary()
+
+    def _write_summary(self):
+        # Les projets ne sont jamais modifiés sur place : le calcul se fait hors du verrou
+        with self._lock:
+            projects = list(self._projects.values())
+            schedule = dict(self._schedule.infos)
+        AtomicJSONStorage(self._summary_path).write(board_summary(projects, schedule))
+
+    def _persist(self, changes):
+        # Appelé sous le verrou : l'écriture différée est seulement mise de côté
+        if self._writer is None:
+            self._write_docs(changes)
+        else:
+            self._outbox.append(changes)
+
+    def _submit_pending(self):
+        # Toujours appelé hors de self._lock : submit() bloque si la file est pleine
+        with self._submit_lock:
+            while self._outbox:
+                self._writer.submit(self._outbox.popleft())
+
+    def _all_docs(self):
+        return {pid: project_to_doc(proj) for pid, proj in self._projects.items()}
+
+    def _docs_snapshot(self):
+        # Instantané pris sous le verrou (copie du seul dictionnaire) : les projets ne sont
+        # jamais modifiés sur place, leur conversion peut se faire plus tard dans un autre thread
+        projects = dict(self._projects)
+        return lambda: {pid: project_to_doc(proj) for pid, proj in projects.items()}
+
+    def save_status(self):
+        """Retourne l'état de l'écriture disque ("saved", "saving" ou "error")"""
+        if self._writer is None:
+            return "saved"
+        status = self._writer.status()
+        return "saving" if status == "saved" and self._outbox else status
+
+    def flush(self, timeout=None):
+        """Attend que les modifications validées soient écrites sur disque"""
+        if self._writer is None:
+            return True
+        self._submit_pending()
+        return self._writer.flush(timeout)
+
+    def close(self, timeout=10.0):
+        """Écrit les modifications restantes et arrête l'écriture en arrière-plan.
+        Retourne False si des modifications n'ont pas pu être écrites dans le délai.
+        """
+        if self._writer is None:
+            return True
+        self._submit_pending()
+        return self._writer.close(timeout)
+
+    def _load(self):
+        docs = self._table.all()
+        projects = [project_from_doc(doc) for doc in docs]
+        # Migrer les anciennes données sans identifiant et les sauvegarder une fois
+        if ensure_ids(projects):
+            doc_ids = save_projects_to_db(self._table, projects)
+            flush_storage(self._table.storage)
+        else:
+            doc_ids = [doc.doc_id for doc in docs]
+        for proj, doc_id in zip(projects, doc_ids):
+            self._projects[proj["id"]] = proj
+            self._versions[proj["id"]] = 1
+            self._doc_ids[proj["id"]] = doc_id
+        self._schedule.rebuild(projects)
+
+    def snapshot(self):
+        """Retourne la vue courante du planning, à traiter en lecture seule"""
+        with self._lock:
+            # Changement de jour : les tâches en retard décalent les dates prévues
+            if self._schedule.refresh():
+                self._snapshot = None
+            if self._snapshot is None:
+                projects = sorted(self._projects.values(), key=lambda p: p["name"].lower())
+                self._snapshot = BoardSnapshot(projects, dict(self._projects), dict(self._versions), dict(self._schedule.infos))
+            return self._snapshot
+
+    def get(self, project_id):
+        """Retourne le projet partagé (lecture seule) ou None"""
+        with self._lock:
+            return self._projects.get(project_id)
+
+    def commit(self, changes, base_versions, session_id=None, undo_of=None, kind=None):
+        """Applique les projets modifiés (None = suppression) si leurs versions n'ont pas bougé.
+
+        Lève ConflictError sans rien appliquer si une autre session a validé avant.
+        Les différences sont ajoutées au journal sous un identifiant de validation
+        (`kind` : type de validation, voir `journal.ARCHIVE_KIND`).
+        """
+        with self._lock:
+            self._commit_locked(changes, base_versions, session_id, undo_of, kind)
+        self._submit_pending()
+
+    def _commit_locked(self, changes, base_versions, session_id=None, undo_of=None, kind=None):
+        # Corps de `commit`, à appeler sous self._lock puis suivre de _submit_pending()
+        conflicts = [pid for pid in changes if self._versions.get(pid, 0) != base_versions.get(pid, 0)]
+        if conflicts:
+            raise ConflictError(conflicts)
+        docs = {}
+        deltas = []
+        for pid, proj in changes.items():
+            if self._journal is not None:
+                old = self._projects.get(pid)
+                deltas.extend(diff_project_docs(
+                    pid,
+                    project_to_doc(old) if old is not None else None,
+                    project_to_doc(proj) if proj is not None else None,
+                ))
+            self._versions[pid] = self._versions.get(pid, 0) + 1
+            if proj is None:
+                self._projects.pop(pid, None)
+                if pid in self._doc_ids:
+                    docs[self._doc_ids.pop(pid)] = None
+            else:
+                if pid not in self._doc_ids:
+                    self._doc_ids[pid] = self._next_doc_id
+                    self._next_doc_id += 1
+                self._projects[pid] = proj
+                docs[self._doc_ids[pid]] = project_to_doc(proj)
+        self._schedule.update(changes)
+        self._snapshot = None
+        self._persist(docs)
+        if self._journal is not None:
+            self._journal.record(deltas, new_id(), session_id, undo_of, state_snapshot=self._docs_snapshot, kind=kind)
+
+    def would_create_cycle(self, task_id, predecessor_id):
+        """Indique si le lien `predecessor_id` → `task_id` fermerait un cycle de dépendances"""
+        with self._lock:
+            return self._schedule.would_create_cycle(task_id, predecessor_id)
+
+    def archive_finished(self, archive_store, task_age_weeks, now=None):
+        """Déplace vers les archives les projets terminés et les tâches terminées anciennes.
+
+        Les archives sont écrites avant le retrait du planning : en cas d'arrêt entre
+        les deux, une donnée peut être en double mais jamais perdue.
+        Retourne (nombre de projets, nombre de tâches) archivés.
+        """
+        now = now or datetime.now()
+        with self._lock:
+            changes = {}
+            project_docs = []
+            task_docs = []
+            for pid, proj in self._projects.items():
+                if is_project_archivable(proj, now):
+                    changes[pid] = None
+                    project_docs.append(project_to_doc(proj))
+                    continue
+                old_tasks = [t for t in proj["tasks"] if is_task_archivable(t, now, task_age_weeks)]
+                if old_tasks:
+                    kept = copy_project(proj)
+                    kept["tasks"] = [t for t in kept["tasks"] if not is_task_archivable(t, now, task_age_weeks)]
+                    changes[pid] = kept
+                    archived = project_to_doc(dict(proj, tasks=old_tasks))["tasks"]
+                    task_docs.extend(dict(doc, project_id=pid, project_name=proj["name"]) for doc in archived)
+            if changes:
+                archive_store.add(project_docs, task_docs)
+                # Journalisé mais non annulable : les données restent dans les archives
+                self._commit_locked(changes, self._versions, kind=ARCHIVE_KIND)
+        self._submit_pending()
+        return len(project_docs), len(task_docs)
+
+    def clear(self):
+        """Supprime tous les projets (les versions sont incrémentées pour invalider les surcouches)"""
+        with self._lock:
+            self._commit_locked({pid: None for pid in self._projects}, self._versions)
+        self._submit_pending()
+
+    def history(self, limit=20):
+        """Retourne le résumé des dernières validations journalisées"""
+        if self._journal is None:
+            return []
+        with self._lock:
+            return self._journal.history(limit)
+
+    def undo(self, count, session_id=None):
+        """Annule les `count` dernières validations (l'annulation est elle-même journalisée).
+
+        Les archivages ne sont pas annulés : ce qui a été archivé reste dans les archives.
+        Retourne le nombre de validations annulées.
+        """
+        if self._journal is None:
+            return 0
+        with self._lock:
+            transactions = self._journal.last_transactions(count)
+            affected = {entry["project_id"] for entries in transactions for entry in entries}
+            docs = {pid: project_to_doc(self._projects[pid]) for pid in affected if pid in self._projects}
+            # Défaire de la plus récente à la plus ancienne
+            for entries in transactions:
+                for entry in reversed(entries):
+                    apply_delta(docs, entry, "old")
+            changes = {pid: project_from_doc(docs[pid]) if pid in docs else None for pid in affected}
+            self._commit_locked(changes, self._versions, session_id, undo_of=[entries[0]["tx"] for entries in transactions])
+        self._submit_pending()
+        return len(transactions)
+
+    def projects_as_of(self, when):
+        """Reconstruit les projets tels qu'ils étaient à la date `when` (None si avant le journal)"""
+        if self._journal is None:
+            return None
+        with self._lock:
+            docs = self._journal.state_as_of(when)
+        if docs is None:
+            return None
+        return sorted((project_from_doc(doc) for doc in docs.values()), key=lambda p: p["name"].lower())
+
+
+class SessionOverlay:
+    """Modifications en attente d'une session : copies des seuls projets touchés"""
+
+    def __init__(self):
+        self.session_id = new_id()  # identifie la session dans le journal
+        self.changes = {}  # id projet → copie modifiée, ou None si supprimé
+        self.bases = {}  # id projet → version lue par la session
+        self._tasks = {}  # id projet → {id tâche: copie de la tâche}
+
+    def project(self, board, project_id, base_version):
+        """Retourne la copie modifiable du projet, créée au premier accès"""
+        if project_id not in self.changes:
+            copy = copy_project(board.get(project_id))
+            self.changes[project_id] = copy
+            self.bases[project_id] = base_version
+            self._tasks[project_id] = {task["id"]: task for task in copy["tasks"]}
+        return self.changes[project_id]
+
+    def task(self, board, project_id, task_id, base_version):
+        """Retourne la copie modifiable d'une tâche (accès O(1) par identifiant)"""
+        self.project(board, project_id, base_version)
+        return self._tasks[project_id][task_id]
+
+    def add_project(self, project):
+        """Prépare la création d'un nouveau projet"""
+        self.changes[project["id"]] = project
+        self.bases[project["id"]] = 0
+        self._tasks[project["id"]] = {task["id"]: task for task in project.get("tasks", [])}
+
+    def delete_project(self, project_id, base_version):
+        """Prépare la suppression d'un projet"""
+        self.changes[project_id] = None
+        self.bases[project_id] = base_version
+        self._tasks.pop(project_id, None)
+
+    def add_tasks(self, board, project_id, tasks, base_version):
+        """Ajoute des tâches à la copie du projet"""
+        proj = self.project(board, project_id, base_version)
+        proj["tasks"].extend(tasks)
+        for task in tasks:
+            self._tasks[project_id][task["id"]] = task
+
+    def replace_tasks(self, board, project_id, tasks, base_version):
+        """Remplace toutes les tâches de la copie du projet (édition en grille)"""
+        proj = self.project(board, project_id, base_version)
+        proj["tasks"] = list(tasks)
+        self._tasks[project_id] = {task["id"]: task for task in proj["tasks"]}
+
+    def commit(self, board):
+        """Valide les modifications en attente ; la surcouche est vidée dans tous les cas"""
+        try:
+            if self.changes:
+                board.commit(self.changes, self.bases, self.session_id)
+        finally:
+            self.discard()
+
+    def discard(self):
+        """Abandonne les modifications en attente"""
+        self.changes = {}
+        self.bases = {}
+        self._tasks = {}
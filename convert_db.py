@@ -0,0 +1,40 @@
+"""Convertit une base du planning d'un format à l'autre.
+
+Le format est déduit de l'extension : `.json` (JSON), `.msgpack` (MessagePack),
+suivie de `.gz` pour une base compressée. Exemples :
+
+    python convert_db.py db.json db.msgpack.gz
+    python convert_db.py boards/equipe/db.json.gz boards/equipe/db.json
+
+Puis démarrer l'application avec le format correspondant, par exemple
+`OBEYA_DB_FORMAT=msgpack OBEYA_DB_COMPRESSION=gzip streamlit run planning_gui.py`.
+La base source n'est pas supprimée.
+"""
+import argparse
+import os
+import sys
+
+from storage import convert_db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversion de la base du planning Obeya")
+    parser.add_argument("source", help="base à lire (.json, .msgpack, .gz)")
+    parser.add_argument("target", help="base à écrire (.json, .msgpack, .gz)")
+    parser.add_argument("--force", action="store_true", help="remplacer la base cible si elle existe")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        parser.error(f"base introuvable : {args.source}")
+    if os.path.exists(args.target) and not args.force:
+        parser.error(f"la base cible existe déjà : {args.target} (--force pour la remplacer)")
+    try:
+        tables = convert_db(args.source, args.target)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{args.source} → {args.target} ({tables} table(s), {os.path.getsize(args.target)} octets)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
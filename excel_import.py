@@ -0,0 +1,107 @@
+"""Import Excel en deux temps : aperçu puis confirmation.
+
+Le classeur n'est lu qu'une fois : les lignes lues sont gardées dans un cache LRU
+partagé par les sessions, indexé par l'empreinte SHA-256 du fichier et le nom de la
+feuille. L'aperçu, les corrections ligne par ligne et la confirmation réutilisent
+ce résultat sans relire le fichier ; un même classeur importé dans plusieurs
+projets n'est lu qu'une fois.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+from planning import parse_task_rows
+
+# Libellés des champs corrigés à la lecture
+_FIELD_LABELS = {"category": "Catégorie", "due_date": "Date", "progress": "Progression"}
+
+
+# Fonction pour calculer la clé d'un import (contenu du fichier + feuille)
+def import_key(data, sheet_name):
+    """Retourne la clé (empreinte SHA-256, feuille) d'un classeur importé"""
+    return hashlib.sha256(data).hexdigest(), sheet_name
+
+
+class ParseCache:
+    """Résultats de lecture des classeurs (LRU borné en nombre d'entrées et de lignes)"""
+
+    def __init__(self, max_entries=16, max_rows=100_000):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # clé → lignes lues
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retourne les lignes lues pour `key` (None si absentes ou évincées)"""
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+            return rows
+
+    def parse(self, data, sheet_name):
+        """Lit le classeur `data` (octets) s'il n'est pas en cache et retourne sa clé.
+        Lève une exception si le fichier ne peut pas être lu.
+        """
+        key = import_key(data, sheet_name)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key
+        # Lecture hors du verrou : une autre session peut lire un autre classeur en parallèle
+        rows = parse_task_rows(BytesIO(data), sheet_name=sheet_name)
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = rows
+                self._rows += len(rows)
+            # Évincer les plus anciens (le plus récent est toujours gardé)
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._rows > self.max_rows):
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+        return key
+
+
+def _duplicate_key(name, due_date):
+    return name.strip().lower(), due_date.date()
+
+
+# Fonction pour préparer le tableau d'aperçu d'un import
+def preview_frame(rows, existing_tasks):
+    """Retourne le DataFrame d'aperçu : une ligne par tâche lue, corrections et doublons signalés.
+    Les doublons (même nom et même échéance qu'une tâche du projet ou qu'une ligne
+    précédente du fichier) ne sont pas cochés pour l'import.
+    """
+    existing = {_duplicate_key(t["name"], t["due_date"]) for t in existing_tasks}
+    seen = set()
+    records = []
+    for row in rows:
+        key = _duplicate_key(row["name"], row["due_date"])
+        if key in existing:
+            duplicate = "⚠️ déjà dans le projet"
+        elif key in seen:
+            duplicate = "⚠️ en double dans le fichier"
+        else:
+            duplicate = ""
+            seen.add(key)
+        corrections = [
+            f"{_FIELD_LABELS[field]} « {raw} » → {row[field].strftime('%d/%m/%Y') if field == 'due_date' else row[field]}"
+            for field, raw in row["corrected"].items()
+        ]
+        records.append({
+            "Importer": duplicate == "",
+            "Nom": row["name"],
+            "Catégorie": row["category"],
+            "Échéance": row["due_date"].date(),
+            "Progression": row["progress"],
+            "Corrections": " ; ".join(corrections),
+            "Doublon": duplicate,
+        })
+    return pd.DataFrame(records, columns=["Importer", "Nom", "Catégorie", "Échéance", "Progression", "Corrections", "Doublon"])
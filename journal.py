@@ -0,0 +1,269 @@
+"""Journal des modifications du planning.
+
+Chaque validation ajoute au journal les différences champ par champ (projet, tâche,
+champ, ancienne → nouvelle valeur, date, session) au lieu d'une copie du planning.
+Le journal est découpé en segments : tous les `checkpoint_every` changements, un
+point de reprise (état complet) est écrit et un nouveau segment commence. On peut
+ainsi reconstruire le planning à n'importe quelle date (point de reprise précédent
++ rejeu du segment) et annuler les dernières validations.
+
+Les points de reprise périodiques sont écrits dans un thread : la validation qui
+remplit le segment ne fait qu'ouvrir le segment suivant. Si le processus s'arrête
+avant la fin de l'écriture, le point de reprise manquant est reconstruit au
+démarrage suivant (point de reprise précédent + rejeu du segment qu'il clôt).
+
+Fichiers (dans le dossier du journal) :
+- `checkpoint-<n>-<date>.json` : état complet des projets (documents JSON)
+- `segment-<n>.jsonl` : changements postérieurs au point de reprise n
+"""
+import copy
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+from storage import write_json_by_entry
+
+# Pseudo-champs : création / suppression d'un projet entier ou d'une tâche entière
+PROJECT_FIELD = "__project__"
+TASK_FIELD = "__task__"
+
+# Type des validations d'archivage : journalisées mais jamais annulées (les données
+# restent dans `archive.json`, les remettre au planning les dupliquerait)
+ARCHIVE_KIND = "archive"
+
+_CHECKPOINT_RE = re.compile(r"^checkpoint-(\d{6})-(\d{8}T\d{12})\.json$")
+
+
+def _timestamp():
+    return datetime.now().isoformat(timespec="microseconds")
+
+
+def diff_project_docs(project_id, old, new):
+    """Retourne les différences entre deux documents de projet (None = absent)"""
+    if old is None or new is None:
+        if old is None and new is None:
+            return []
+        return [{"project_id": project_id, "task_id": None, "field": PROJECT_FIELD, "old": old, "new": new}]
+    deltas = []
+    for field in sorted((set(old) | set(new)) - {"tasks"}):
+        if old.get(field) != new.get(field):
+            deltas.append({"project_id": project_id, "task_id": None, "field": field, "old": old.get(field), "new": new.get(field)})
+    old_tasks = {task["id"]: task for task in old.get("tasks", [])}
+    new_tasks = {task["id"]: task for task in new.get("tasks", [])}
+    for task_id, task in old_tasks.items():
+        if task_id not in new_tasks:
+            deltas.append({"project_id": project_id, "task_id": task_id, "field": TASK_FIELD, "old": task, "new": None})
+    for task_id, task in new_tasks.items():
+        before = old_tasks.get(task_id)
+        if before is None:
+            deltas.append({"project_id": project_id, "task_id": task_id, "field": TASK_FIELD, "old": None, "new": task})
+            continue
+        for field in sorted(set(before) | set(task)):
+            if before.get(field) != task.get(field):
+                deltas.append({"project_id": project_id, "task_id": task_id, "field": field, "old": before.get(field), "new": task.get(field)})
+    return deltas
+
+
+def apply_delta(docs, entry, side):
+    """Applique un changement aux documents `id projet → document` (side="new" pour rejouer, "old" pour annuler)"""
+    project_id, task_id, field = entry["project_id"], entry["task_id"], entry["field"]
+    value = copy.deepcopy(entry[side])
+    if field == PROJECT_FIELD:
+        if value is None:
+            docs.pop(project_id, None)
+        else:
+            docs[project_id] = value
+        return
+    doc = docs.get(project_id)
+    if doc is None:
+        return
+    if task_id is None:
+        doc[field] = value
+    elif field == TASK_FIELD:
+        doc["tasks"] = [task for task in doc.get("tasks", []) if task["id"] != task_id]
+        if value is not None:
+            doc["tasks"].append(value)
+    else:
+        for task in doc.get("tasks", []):
+            if task["id"] == task_id:
+                task[field] = value
+
+
+class Journal:
+    """Journal en ajout seul, découpé en segments avec points de reprise"""
+
+    def __init__(self, directory, checkpoint_every=1000):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        os.makedirs(directory, exist_ok=True)
+        # Points de reprise connus : (numéro, date ISO), lus depuis les noms de fichiers
+        self._checkpoints = []
+        for name in os.listdir(directory):
+            match = _CHECKPOINT_RE.match(name)
+            if match:
+                stamp = datetime.strptime(match.group(2), "%Y%m%dT%H%M%S%f").isoformat(timespec="microseconds")
+                self._checkpoints.append((int(match.group(1)), stamp, name))
+        self._checkpoints.sort()
+        self._checkpoint_thread = None  # écriture du dernier point de reprise en cours
+        self._recover_checkpoints()
+        # Seul le segment courant est gardé en mémoire
+        self._entries = self._read_segment(self._checkpoints[-1][0]) if self._checkpoints else []
+        self._seq = self._entries[-1]["seq"] if self._entries else 0
+
+    def _recover_checkpoints(self):
+        # Un segment sans point de reprise : l'écriture en arrière-plan a été interrompue
+        while self._checkpoints and os.path.exists(self._segment_path(self._checkpoints[-1][0] + 1)):
+            index, stamp, name = self._checkpoints[-1]
+            with open(os.path.join(self.directory, name), encoding="utf-8") as handle:
+                state = json.load(handle)
+            entries = self._read_segment(index)
+            for entry in entries:
+                apply_delta(state["projects"], entry, "new")
+            cut = datetime.fromisoformat(entries[-1]["ts"] if entries else stamp)
+            seq = entries[-1]["seq"] if entries else state["seq"]
+            self._checkpoints.append(self._write_checkpoint(index + 1, cut, seq, state["projects"]))
+
+    def _segment_path(self, index):
+        return os.path.join(self.directory, f"segment-{index:06d}.jsonl")
+
+    def _read_segment(self, index):
+        try:
+            with open(self._segment_path(index), encoding="utf-8") as handle:
+                return [json.loads(line) for line in handle if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def has_checkpoint(self):
+        """Indique si un état initial a déjà été enregistré"""
+        return bool(self._checkpoints)
+
+    def _checkpoint_entry(self, index, when):
+        # Entrée d'un point de reprise : (numéro, date ISO, nom du fichier)
+        return index, when.isoformat(timespec="microseconds"), f"checkpoint-{index:06d}-{when:%Y%m%dT%H%M%S%f}.json"
+
+    def _write_checkpoint(self, index, when, seq, docs):
+        # Écrit le fichier du point de reprise et retourne son entrée
+        entry = self._checkpoint_entry(index, when)
+        write_json_by_entry(os.path.join(self.directory, entry[2]), {"ts": entry[1], "seq": seq, "projects": docs}, "projects")
+        return entry
+
+    def _wait_checkpoint(self):
+        if self._checkpoint_thread is not None:
+            self._checkpoint_thread.join()
+            self._checkpoint_thread = None
+
+    def checkpoint(self, docs):
+        """Écrit un point de reprise (état complet) et ouvre un nouveau segment"""
+        self._wait_checkpoint()
+        index = self._checkpoints[-1][0] + 1 if self._checkpoints else 1
+        self._checkpoints.append(self._write_checkpoint(index, datetime.now(), self._seq, docs))
+        self._entries = []
+
+    def _checkpoint_in_background(self, build_docs):
+        # Le segment suivant est ouvert tout de suite ; l'état complet est construit et écrit dans un thread
+        self._wait_checkpoint()
+        index = self._checkpoints[-1][0] + 1
+        now = datetime.now()
+        seq = self._seq
+        self._checkpoints.append(self._checkpoint_entry(index, now))
+        self._entries = []
+        self._checkpoint_thread = threading.Thread(
+            target=lambda: self._write_checkpoint(index, now, seq, build_docs()),
+            name="obeya-journal-checkpoint",
+            daemon=True,
+        )
+        self._checkpoint_thread.start()
+
+    def record(self, deltas, tx, session_id=None, undo_of=None, state_snapshot=None, kind=None):
+        """Ajoute les changements d'une validation ; compacte si le segment est plein.
+
+        `state_snapshot()` est appelé seulement lors d'un point de reprise : il retourne
+        une fonction sans argument qui construit l'état complet (appelée hors du chemin
+        de la validation, dans le thread d'écriture du point de reprise).
+        `kind` marque les validations particulières (ARCHIVE_KIND : non annulable).
+        """
+        if not deltas:
+            return
+        stamp = _timestamp()
+        lines = []
+        for delta in deltas:
+            self._seq += 1
+            entry = dict(delta, seq=self._seq, tx=tx, ts=stamp, session=session_id)
+            if undo_of:
+                entry["undo_of"] = list(undo_of)
+            if kind:
+                entry["kind"] = kind
+            self._entries.append(entry)
+            lines.append(json.dumps(entry, ensure_ascii=False))
+        with open(self._segment_path(self._checkpoints[-1][0]), "a", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+        if state_snapshot is not None and len(self._entries) >= self.checkpoint_every:
+            self._checkpoint_in_background(state_snapshot())
+
+    def _transactions(self):
+        # Validations du plus récent au plus ancien, segment courant puis segments précédents
+        for position in range(len(self._checkpoints) - 1, -1, -1):
+            index = self._checkpoints[position][0]
+            entries = self._entries if position == len(self._checkpoints) - 1 else self._read_segment(index)
+            group = []
+            for entry in reversed(entries):
+                if group and group[-1]["tx"] != entry["tx"]:
+                    yield group[::-1]
+                    group = []
+                group.append(entry)
+            if group:
+                yield group[::-1]
+
+    def history(self, limit=20):
+        """Retourne un résumé des `limit` dernières validations (la plus récente d'abord)"""
+        summary = []
+        for entries in self._transactions():
+            summary.append({
+                "tx": entries[0]["tx"],
+                "ts": entries[0]["ts"],
+                "session": entries[0]["session"],
+                "changes": len(entries),
+                "undo": bool(entries[0].get("undo_of")),
+                "archive": entries[0].get("kind") == ARCHIVE_KIND,
+            })
+            if len(summary) >= limit:
+                break
+        return summary
+
+    def last_transactions(self, count):
+        """Retourne les `count` dernières validations annulables (la plus récente d'abord).
+
+        Les annulations elles-mêmes, les validations déjà annulées et les archivages sont ignorés.
+        """
+        undone = set()
+        selected = []
+        for entries in self._transactions():
+            undo_of = entries[0].get("undo_of")
+            if undo_of:
+                undone.update(undo_of)
+                continue
+            if entries[0]["tx"] in undone or entries[0].get("kind") == ARCHIVE_KIND:
+                continue
+            selected.append(entries)
+            if len(selected) >= count:
+                break
+        return selected
+
+    def state_as_of(self, when):
+        """Reconstruit les documents `id projet → document` à la date `when` (None si avant le journal)"""
+        self._wait_checkpoint()
+        stamp = when.isoformat(timespec="microseconds")
+        candidates = [c for c in self._checkpoints if c[1] <= stamp]
+        if not candidates:
+            return None
+        index, _, name = candidates[-1]
+        with open(os.path.join(self.directory, name), encoding="utf-8") as handle:
+            docs = json.load(handle)["projects"]
+        entries = self._entries if index == self._checkpoints[-1][0] else self._read_segment(index)
+        for entry in entries:
+            if entry["ts"] > stamp:
+                break
+            apply_delta(docs, entry, "new")
+        return docs
@@ -0,0 +1,435 @@
+"""Logique du planning Obeya, sortie du script Streamlit pour être réutilisable.
+
+Construction de la frise (12 semaines + 6 mois), placement des projets et des
+tâches dans la grille, rendu HTML du tableau et import Excel. Le script
+`planning_gui.py` et les benchmarks (`benchmarks/`) utilisent ces fonctions.
+"""
+# Importer calendar pour les informations sur les calendriers
+import calendar
+# Importer datetime pour manipuler les dates
+from datetime import datetime, timedelta
+# Utilisé pour échapper le texte dans les attributs HTML
+from html import escape
+from collections import namedtuple
+
+# Importer pandas pour créer des DataFrames
+import pandas as pd
+
+from board_model import new_id
+from recurrence import describe_recurrence, expand_tasks
+
+# Listes d'options partagées par les formulaires, les filtres et l'import
+TASK_CATEGORIES = ["Jalon", "Livrable", "Etude", "Prototype", "Map-Qual-Val", "Industrialisation"]
+TASK_PROGRESS = ["0%", "50%", "100%"]
+PROJECT_STATUSES = ["Pas démarré", "Dans les temps", "En retard", "Critique", "StandBy"]
+
+# Lignes du tableau de planning : contenu, classes CSS et tooltips par cellule, id du projet
+# et tâches affichables (occurrences des séries récurrentes comprises)
+PlanningGrid = namedtuple("PlanningGrid", ["rows", "styles", "tooltips", "project_ids", "tasks"])
+
+
+# Fonction pour construire la frise : 12 semaines puis 6 mois
+def build_timeline(date_debut):
+    """Retourne (period_labels, period_types, period_starts, period_ends) à partir de la date de début"""
+    # Créer une liste pour stocker les données des semaines
+    donnees_semaines = []
+
+    # Boucle pour générer les données de chaque semaine
+    for i in range(12):
+        # Calculer la date de début de la semaine courante
+        date_semaine_debut = date_debut + timedelta(weeks=i)
+        # Calculer la date de fin de la semaine
+        date_semaine_fin = date_semaine_debut + timedelta(days=6)
+
+        # Ajouter les données de la semaine dans la liste
+        donnees_semaines.append({
+            # Ajouter le numéro de la semaine
+            "Semaine": f"S{i+1:02d}",
+            # Ajouter la date de début
+            "Date de début": date_semaine_debut.strftime('%d/%m/%Y'),
+            # Ajouter la date de fin
+            "Date de fin": date_semaine_fin.strftime('%d/%m/%Y'),
+            # Ajouter le jour de début
+            "Jour début": date_semaine_debut.strftime('%A'),
+            # Ajouter le jour de fin
+            "Jour fin": date_semaine_fin.strftime('%A')
+        })
+
+    # Construire la liste des tâches pour le Gantt
+    tasks = []
+
+    # Ajouter les 12 semaines en tant que tâches
+    for i, s in enumerate(donnees_semaines):
+        # Calculer les dates de début et fin réelles en datetime
+        start = datetime.strptime(s["Date de début"], "%d/%m/%Y")
+        end = datetime.strptime(s["Date de fin"], "%d/%m/%Y") + timedelta(days=1)  # rendre la fin inclusive
+        # Construire le label de la tâche : utiliser le numéro ISO de la semaine
+        week_num = start.isocalendar()[1]
+        label = f"S{week_num:02d} ({start.strftime('%d/%m')})"
+        # Ajouter la tâche avec le type 'Semaine' et un ordre pour conserver la séquence
+        tasks.append({"Task": label, "Start": start, "Finish": end, "Type": "Semaine", "Order": i})
+
+    # Calculer la date de début pour les mois (après la 12ème semaine)
+    date_mois_debut = date_debut + timedelta(weeks=12)
+
+    # Générer les 6 mois et les ajouter après les semaines
+    for i in range(6):
+        mois = (date_mois_debut.month + i - 1) % 12 + 1
+        annee = date_mois_debut.year + (date_mois_debut.month + i - 1) // 12
+        nombre_jours_mois = calendar.monthrange(annee, mois)[1]
+        start = datetime(annee, mois, 1)
+        end = datetime(annee, mois, nombre_jours_mois) + timedelta(days=1)
+        noms_mois = ["Janvier", "Février", "Mars", "Avril", "Mai", "Juin", "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"]
+        nom_mois = noms_mois[mois - 1]
+        label = f"{nom_mois} {annee}"
+        tasks.append({"Task": label, "Start": start, "Finish": end, "Type": "Mois", "Order": 12 + i})
+
+    # Créer un DataFrame pour le Gantt
+    df_gantt = pd.DataFrame(tasks)
+
+    # Construire des colonnes catégorielles : 12 semaines puis 6 mois
+    period_labels = df_gantt.sort_values("Order")["Task"].tolist()  # ordre des colonnes
+    period_types = df_gantt.sort_values("Order")["Type"].tolist()
+    period_starts = df_gantt.sort_values("Order")["Start"].tolist()
+    period_ends = df_gantt.sort_values("Order")["Finish"].tolist()
+    return period_labels, period_types, period_starts, period_ends
+
+
+# Fonction pour convertir une date absolue en indice de période
+def date_to_period_index(date, period_labels, period_starts, period_ends):
+    """Retourne l'indice de la période qui contient la date donnée"""
+    for idx in range(len(period_labels)):
+        if period_starts[idx] <= date <= period_ends[idx]:
+            return idx
+    # Si la date n'est pas dans les périodes, retourner l'indice le plus proche
+    if date < period_starts[0]:
+        return 0
+    else:
+        return len(period_labels) - 1
+
+
+# Helper: lire les lignes de tâches d'un fichier Excel avec le détail des corrections
+def parse_task_rows(uploaded_file, sheet_name="Model Tache"):
+    """Lit un fichier Excel et retourne une ligne normalisée par tâche.
+    Colonnes attendues (en ordre): Nom, Catégorie, Date d'échéance, Progression.
+    - Ignore la première ligne (entêtes) via pandas (header=0)
+    - Si la catégorie n'est pas reconnue, utilise "Jalon"
+    - Si la date n'est pas valide, utilise la date du jour
+    - Si la progression n'est pas 0%/50%/100%, utilise 0%
+    Chaque ligne contient `corrected` : les champs corrigés avec leur valeur d'origine.
+    Lève une exception si le fichier ne peut pas être lu.
+    """
+    allowed_categories = TASK_CATEGORIES
+    allowed_progress = TASK_PROGRESS
+
+    df = pd.read_excel(uploaded_file, sheet_name=sheet_name, engine="openpyxl")
+
+    rows = []
+    today = datetime.now()
+
+    # Parcourir les lignes de données (pandas considère la première ligne comme en-tête)
+    for _, row in df.iterrows():
+        # Lecture des colonnes par position
+        name = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else ""
+        if name == "" or name.lower() in ("nan", "none"):
+            # Ignorer les lignes sans nom de tâche
+            continue
+        corrected = {}
+
+        raw_category = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else ""
+        category = raw_category if raw_category in allowed_categories else "Jalon"
+        if category != raw_category:
+            corrected["category"] = raw_category
+
+        # Date d'échéance
+        raw_due = row.iloc[2] if len(row) > 2 else None
+        due_pd = pd.to_datetime(raw_due, errors="coerce")
+        if pd.isna(due_pd):
+            due_date = today
+            corrected["due_date"] = "" if raw_due is None or pd.isna(raw_due) else str(raw_due)
+        else:
+            # Convertir en datetime natif
+            due_date = due_pd.to_pydatetime()
+
+        # Progression
+        raw_progress = str(row.iloc[3]).strip() if (len(row) > 3 and pd.notna(row.iloc[3])) else ""
+        progress = raw_progress if raw_progress in allowed_progress else "0%"
+        if progress != raw_progress:
+            corrected["progress"] = raw_progress
+
+        rows.append({
+            "name": name,
+            "category": category,
+            "due_date": due_date,
+            "progress": progress,
+            "corrected": corrected,
+        })
+
+    return rows
+
+
+# Helper: préparer les tâches d'un projet pour l'éditeur en grille
+def tasks_to_editor_frame(tasks):
+    """Retourne un DataFrame (une ligne par tâche) pour `st.data_editor`"""
+    return pd.DataFrame(
+        [
+            {
+                "id": task["id"],
+                "Nom": task["name"],
+                "Catégorie": task.get("category", "Jalon"),
+                "Échéance": task["due_date"].date(),
+                "Progression": task.get("progress", "0%"),
+                "Récurrence": describe_recurrence(task.get("recurrence")),
+            }
+            for task in tasks
+        ],
+        columns=["id", "Nom", "Catégorie", "Échéance", "Progression", "Récurrence"],
+    )
+
+
+# Helper: reconstruire la liste des tâches à partir des lignes de l'éditeur
+def tasks_from_editor_rows(tasks, rows):
+    """Applique les lignes éditées aux tâches existantes et retourne (tâches, erreurs).
+    - Une ligne sans id est une nouvelle tâche
+    - Une tâche dont l'id n'apparaît plus est supprimée
+    - Les autres champs des tâches existantes sont conservés
+    """
+    existing = {task["id"]: task for task in tasks}
+    new_tasks = []
+    errors = []
+    for line, row in enumerate(rows, start=1):
+        raw_name = row.get("Nom")
+        name = str(raw_name).strip() if pd.notna(raw_name) else ""
+        category = row.get("Catégorie")
+        progress = row.get("Progression")
+        due = pd.to_datetime(row.get("Échéance"), errors="coerce")
+        if name == "":
+            errors.append(f"Ligne {line} : nom requis.")
+        if category not in TASK_CATEGORIES:
+            errors.append(f"Ligne {line} : catégorie invalide.")
+        if progress not in TASK_PROGRESS:
+            errors.append(f"Ligne {line} : progression invalide.")
+        if pd.isna(due):
+            errors.append(f"Ligne {line} : date d'échéance invalide.")
+            continue
+        task_id = row.get("id")
+        task = dict(existing[task_id]) if task_id in existing else {"id": new_id()}
+        task.update({
+            "name": name,
+            "category": category,
+            "due_date": datetime.combine(due.date(), datetime.min.time()),
+            "progress": progress,
+        })
+        new_tasks.append(task)
+    return new_tasks, errors
+
+
+# Fonction pour décrire la date prévue et la marge d'une tâche liée (tooltips)
+def schedule_note(schedule, task):
+    """Retourne « • prévue le …, marge … j » pour une tâche liée, sinon une chaîne vide"""
+    info = schedule.get(task["id"]) if schedule else None
+    if info is None:
+        return ""
+    note = f" • prévue le {info.forecast.strftime('%d/%m/%Y')}, marge {info.slack} j"
+    if info.at_risk:
+        note += " • à risque"
+    elif info.critical:
+        note += " • chemin critique"
+    return note
+
+
+# Fonction pour placer les projets et leurs tâches dans les périodes de la frise
+def build_planning_grid(projects, filtered_categories, period_labels, period_starts, period_ends, now=None, schedule=None):
+    """Construit une ligne par projet (tâches à venir intégrées dans les cellules de période).
+    `schedule` (id tâche → ScheduleInfo) met en évidence les tâches critiques et à risque.
+    """
+    now = now or datetime.now()
+    grid = PlanningGrid([], [], [], [], [])
+    for p in projects:
+        # Les séries récurrentes ne sont développées que sur la fenêtre de la frise
+        project_tasks = expand_tasks(p.get("tasks", []), period_starts[0], period_ends[-1])
+        # Ligne unique pour le projet (les tâches seront intégrées dans les cellules du projet)
+        row = {"Projet/Tâche": f"📋 {p['name']}"}
+        start_idx = date_to_period_index(p["start_date"], period_labels, period_starts, period_ends)
+        end_idx = date_to_period_index(p["end_date"], period_labels, period_starts, period_ends)
+
+        row_styles = ["project"]  # Style pour la colonne Projet/Tâche
+        row_tooltips = [""]  # Tooltip vide pour la colonne Projet/Tâche
+        project_tooltip = f"{p['name']} • fin {p['end_date'].strftime('%d/%m/%Y')}"
+        tasks_per_period = [[] for _ in period_labels]  # Collecter les tâches par période pour le tooltip
+
+        # Déterminer la classe CSS en fonction du statut du projet
+        project_status = p.get("status", "Pas démarré")
+        if project_status == "Pas démarré":
+            status_class = "not_started"
+        elif project_status == "En retard":
+            status_class = "overdue"
+        elif project_status == "Critique":
+            status_class = "critical"
+        elif project_status == "StandBy":
+            status_class = "standby"
+        else:  # "Dans les temps" or default
+            status_class = "active"
+
+        for idx, period in enumerate(period_labels):
+            if idx >= start_idx and idx <= end_idx:
+                row[period] = ""  # La couleur de fond suffit pour représenter la période active
+                # Appliquer la classe CSS basée sur le statut du projet
+                row_styles.append(status_class)
+                row_tooltips.append(project_tooltip)
+            else:
+                row[period] = ""
+                row_styles.append("inactive")
+                row_tooltips.append("")
+
+        # Ajouter les tâches directement dans la cellule de période du projet
+        # (sauf les tâches en retard ou filtrées par catégorie)
+        if len(project_tasks) > 0:
+            for task in project_tasks:
+                # Convertir la date de tâche si elle est en string
+                due_date = task["due_date"]
+                if isinstance(due_date, str):
+                    due_date = datetime.fromisoformat(due_date)
+
+                # Ne pas afficher les tâches en retard dans les colonnes
+                if due_date < now:
+                    continue
+
+                # Ne pas afficher les tâches terminées (100%)
+                if task.get("progress", "0%") == "100%":
+                    continue
+
+                # Filtrer par catégorie
+                task_category = task.get("category", "Jalon")
+                if task_category not in filtered_categories:
+                    continue
+
+                due_idx = date_to_period_index(due_date, period_labels, period_starts, period_ends)
+                target_period = period_labels[due_idx]
+                task_progress = task.get("progress", "0%")
+                task_category = task.get("category", "Jalon")
+
+                # Créer le label avec icône et style différents selon la catégorie
+                if task_category == "Jalon":
+                    # Utiliser un icône d'objectif pour les jalons et ajouter la classe CSS
+                    task_label = f"<span class='task_milestone'>🎯 {escape(task['name'])}</span>"
+                elif task_category == "Livrable":
+                    # Utiliser une icône de document pour les livrables
+                    task_label = f"<span class='task_deliverable'>📄 {escape(task['name'])}</span>"
+                elif task_category == "Etude":
+                    # Utiliser une icône de pile de livres pour les études
+                    task_label = f"<span class='task_study'>📚 {escape(task['name'])}</span>"
+                elif task_category == "Prototype":
+                    # Utiliser une icône d'outils pour les prototypes
+                    task_label = f"<span class='task_prototype'>🔧 {escape(task['name'])}</span>"
+                elif task_category == "Map-Qual-Val":
+                    # Utiliser une icône de tube à essai pour les tests
+                    task_label = f"<span class='task_mapqualval'>🧪 {escape(task['name'])}</span>"
+                elif task_category == "Industrialisation":
+                    # Utiliser une icône d'usine pour l'industrialisation
+                    task_label = f"<span class='task_industrialisation'>🏭 {escape(task['name'])}</span>"
+                else:
+                    # Icône losange pour les autres tâches
+                    task_label = f"◆ {escape(task['name'])}"
+
+                # Mettre en évidence les tâches liées à risque ou sur le chemin critique
+                info = schedule.get(task["id"]) if schedule else None
+                if info is not None and info.at_risk:
+                    task_label = f"<span class='task_at_risk'>⏳ {task_label}</span>"
+                elif info is not None and info.critical:
+                    task_label = f"<span class='task_critical_path'>{task_label}</span>"
+
+                existing = row.get(target_period, "")
+                if existing.strip():
+                    row[target_period] = f"{existing}<br>{task_label}"
+                else:
+                    row[target_period] = task_label
+
+                tasks_per_period[due_idx].append(task)
+
+        # Construire les tooltips finaux en combinant projet + tâches de la période
+        for idx, period in enumerate(period_labels):
+            if tasks_per_period[idx]:
+                task_lines = [
+                    f"- {t['name']} (échéance {t['due_date'].strftime('%d/%m/%Y')}) [{t.get('progress', '0%')}]{schedule_note(schedule, t)}"
+                    for t in tasks_per_period[idx]
+                ]
+                tooltip_full = f"{project_tooltip}\nTâches:\n" + "\n".join(task_lines)
+                row_tooltips[idx + 1] = tooltip_full
+        grid.rows.append(row)
+        grid.styles.append(row_styles)
+        grid.tooltips.append(row_tooltips)
+        grid.project_ids.append(p["id"])
+        grid.tasks.append(project_tasks)
+    return grid
+
+
+# Fonction pour générer le HTML du tableau de planning
+def render_planning_html(grid, project_index, filtered_categories, period_labels, today=None):
+    """Retourne le tableau HTML (colonne des tâches en retard + une colonne par période)"""
+    # Date actuelle pour détecter les tâches en retard
+    today = today or datetime.now()
+
+    # Construire le HTML du tableau
+    html_table = '<table>'
+
+    # En-tête
+    html_table += '<tr><th style="text-align: left;">Projet/Tâche</th><th style="text-align: left;">En retard</th>'
+    for period in period_labels:
+        html_table += f'<th style="font-size: 11px;">{period}</th>'
+    html_table += '</tr>'
+
+    # Lignes de données
+    for row_idx, (_, row) in enumerate(pd.DataFrame(grid.rows).iterrows()):
+        html_table += '<tr>'
+        # Première colonne (Projet/Tâche)
+        project_name = row['Projet/Tâche']
+
+        # Colonne projet/tâche
+        if project_name.startswith('📋'):
+            html_table += f'<td class="row_label project_label">{project_name}</td>'
+        else:
+            html_table += f'<td class="row_label task_label">{project_name}</td>'
+
+        # Deuxième colonne (En retard) - afficher les tâches en retard du projet
+        if project_name.startswith('📋'):
+            # C'est un projet - chercher ses tâches en retard (filtrées par catégorie)
+            current_project = project_index.get(grid.project_ids[row_idx])
+            project_full_name = current_project["name"] if current_project else ""
+            overdue_tasks = []
+            if current_project:
+                overdue_tasks = [
+                    t for t in grid.tasks[row_idx]
+                    if t["due_date"] < today 
+                    and t.get("category", "Jalon") in filtered_categories
+                    and t.get("progress", "0%") != "100%"
+                ]
+
+            if overdue_tasks:
+                overdue_html = "<br>".join([f"⚠️ {escape(t['name'])}" for t in overdue_tasks])
+                # Créer un tooltip avec les détails des tâches en retard
+                tooltip_lines = [f"Tâches en retard pour {project_full_name}:"]
+                tooltip_lines.extend([
+                    f"- {t['name']} (échéance {t['due_date'].strftime('%d/%m/%Y')}) [{t.get('progress', '0%')}]"
+                    for t in overdue_tasks
+                ])
+                tooltip_text = "\n".join(tooltip_lines)
+                tooltip_attr = f' title="{escape(tooltip_text)}"'
+                html_table += f'<td style="text-align: left; color: #d32f2f;"{tooltip_attr}>{overdue_html}</td>'
+            else:
+                html_table += '<td style="text-align: left;"></td>'
+        else:
+            html_table += '<td style="text-align: left;"></td>'
+
+        # Colonnes de périodes
+        for period in period_labels:
+            style_class = grid.styles[row_idx][period_labels.index(period) + 1]
+            cell_content = row.get(period, "")
+            tooltip_text = grid.tooltips[row_idx][period_labels.index(period) + 1]
+            tooltip_attr = f' title="{escape(tooltip_text)}"' if tooltip_text else ""
+            html_table += f'<td class="{style_class}"{tooltip_attr}>{cell_content}</td>'
+
+        html_table += '</tr>'
+
+    html_table += '</table>'
+    return html_table
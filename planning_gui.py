@@ -1,17 +1,29 @@
 # Importer streamlit pour créer l'interface visuelle
 import streamlit as st
-# Utilisé pour échapper le texte dans les attributs HTML
-from html import escape
 # Importer datetime pour manipuler les dates
 from datetime import datetime, timedelta
-# Importer calendar pour les informations sur les calendriers
-import calendar
 # Importer pandas pour créer des DataFrames
 import pandas as pd
-# Importer TinyDB pour le stockage persistant des données
-from tinydb import TinyDB, Query
-import json
 import os
+from archive import ArchiveStore
+from board_model import BoardModel, ConflictError, SessionOverlay, new_id
+from excel_import import ParseCache, preview_frame
+from journal import Journal
+from planning import (
+    PROJECT_STATUSES,
+    TASK_CATEGORIES,
+    TASK_PROGRESS,
+    build_planning_grid,
+    build_timeline,
+    date_to_period_index,
+    render_planning_html,
+    tasks_from_editor_rows,
+    tasks_to_editor_frame,
+)
+from profiler import profiler_from_settings
+from recurrence import RECURRENCE_CHOICES, expand_tasks, is_recurring, set_occurrence_progress
+from storage import db_filename, open_db, storage_config_from_env
+from workspaces import Workspaces
 
 # Configurer la page Streamlit avec le titre et l'icône
 st.set_page_config(
@@ -25,6 +37,16 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Profilage par passage (désactivé par défaut) : ?debug=1 ou OBEYA_PROFILE=1
+# Un passage interrompu par st.rerun() est journalisé au début du passage suivant
+if "profiler" in st.session_state:
+    st.session_state.profiler.finish(completed=False)
+profiler = profiler_from_settings(st.query_params, os.environ, os.path.dirname(os.path.abspath(__file__)))
+st.session_state.profiler = profiler
+if "profile" in st.query_params:
+    # Le profil cProfile ne concerne qu'un seul passage
+    del st.query_params["profile"]
+
 # Ajouter du CSS personnalisé adaptatif au thème du système d'exploitation
 # Utilise les media queries CSS pour détecter automatiquement le thème
 st.markdown("""
@@ -110,350 +132,207 @@ cols[1].markdown(f"<div style='font-size:13px'>🗓️ <strong>Semaine</strong><
 st.divider()
 
 # ============================================================================
-# SECTION 1: LES 12 PROCHAINES SEMAINES (header supprimé pour affichage épuré)
+# SECTION: FRISE COMBINÉE (12 SEMAINES => 6 MOIS)
 # ============================================================================
 
-# Créer une liste pour stocker les données des semaines
-donnees_semaines = []
+# Construire des colonnes catégorielles : 12 semaines puis 6 mois
+with profiler.span("timeline"):
+    period_labels, period_types, period_starts, period_ends = build_timeline(date_debut)
+
+# Format de la base (OBEYA_DB_FORMAT, OBEYA_DB_COMPRESSION, OBEYA_DB_CACHE)
+storage_config = storage_config_from_env(os.environ)
+
+# Plannings nommés : chaque planning a ses propres fichiers, chargés seulement à l'ouverture
+workspaces = Workspaces(os.path.dirname(os.path.abspath(__file__)), db_filename(storage_config))
+boards = workspaces.boards()
+# Un planning créé au passage précédent devient le planning sélectionné
+if "pending_board" in st.session_state:
+    st.session_state.board_slug = st.session_state.pop("pending_board")
+with st.sidebar:
+    st.markdown("**🗂️ Plannings**")
+    board_slug = st.selectbox("Planning", options=list(boards), format_func=boards.get, key="board_slug")
+    show_portfolio = st.toggle("📊 Vue portefeuille", key="show_portfolio")
+    if "new_board_count" not in st.session_state:
+        st.session_state.new_board_count = 0
+    new_board_name = st.text_input("Nouveau planning", value="", placeholder="Nom", key=f"new_board_name_{st.session_state.new_board_count}")
+    if st.button("➕ Créer le planning", key="create_board"):
+        if new_board_name.strip() == "":
+            st.error("Nom requis.")
+        else:
+            st.session_state.pending_board = workspaces.create(new_board_name.strip())
+            st.session_state.new_board_count += 1
+            st.rerun()
 
-# Boucle pour générer les données de chaque semaine
-for i in range(12):
-    # Calculer la date de début de la semaine courante
-    date_semaine_debut = date_debut + timedelta(weeks=i)
-    # Calculer la date de fin de la semaine
-    date_semaine_fin = date_semaine_debut + timedelta(days=6)
-    
-    # Ajouter les données de la semaine dans la liste
-    donnees_semaines.append({
-        # Ajouter le numéro de la semaine
-        "Semaine": f"S{i+1:02d}",
-        # Ajouter la date de début
-        "Date de début": date_semaine_debut.strftime('%d/%m/%Y'),
-        # Ajouter la date de fin
-        "Date de fin": date_semaine_fin.strftime('%d/%m/%Y'),
-        # Ajouter le jour de début
-        "Jour début": date_semaine_debut.strftime('%A'),
-        # Ajouter le jour de fin
-        "Jour fin": date_semaine_fin.strftime('%A')
-    })
+# Changement de planning : les modifications en attente et les filtres ne le suivent pas
+if st.session_state.get("active_board") != board_slug:
+    if "active_board" in st.session_state:
+        for key in ("overlay", "seen_versions", "filtered_projects", "filter_projects_selector", "dep_project", "dep_task", "dep_pred_project", "dep_pred_task", "dep_remove"):
+            st.session_state.pop(key, None)
+    st.session_state.active_board = board_slug
+
+# Vue portefeuille : seuls les résumés enregistrés avec chaque planning sont lus
+if show_portfolio:
+    st.markdown("### 📊 Portefeuille")
+    summaries = workspaces.summaries()
+    portfolio_rows = []
+    for slug, name in boards.items():
+        summary = summaries.get(slug)
+        if summary is None:
+            portfolio_rows.append({"Planning": name, "Mis à jour": "jamais ouvert"})
+            continue
+        row = {
+            "Planning": name,
+            "Projets": summary["projects"],
+            "Tâches": summary["tasks"],
+            "Terminées": summary["tasks_done"],
+            "Tâches en retard": summary["tasks_overdue"],
+            "À risque": summary["at_risk"],
+            "Critiques": summary["critical"],
+            "Prochaine échéance": datetime.fromisoformat(summary["next_due"]).strftime("%d/%m/%Y") if summary["next_due"] else "",
+        }
+        # Nombre de projets par état
+        for status in PROJECT_STATUSES:
+            row[f"Projets « {status} »"] = summary["statuses"].get(status, 0)
+        row["Mis à jour"] = datetime.fromisoformat(summary["updated_at"]).strftime("%d/%m/%Y %H:%M")
+        portfolio_rows.append(row)
+    known = [s for s in summaries.values() if s]
+    metric_cols = st.columns(4)
+    metric_cols[0].metric("Plannings", len(boards))
+    metric_cols[1].metric("Projets", sum(s["projects"] for s in known))
+    metric_cols[2].metric("Tâches", sum(s["tasks"] for s in known))
+    metric_cols[3].metric("Tâches en retard", sum(s["tasks_overdue"] for s in known))
+    st.dataframe(pd.DataFrame(portfolio_rows), hide_index=True, use_container_width=True)
+    profiler.finish()
+    st.stop()
+
+# Initialiser TinyDB pour la persistance des données (fichiers du planning sélectionné)
+board_paths = workspaces.paths(board_slug)
+db_path = board_paths.db
+# Les projets terminés et les vieilles tâches terminées sont archivés dans un fichier séparé
+archive_path = board_paths.archive
+ARCHIVE_TASK_AGE_WEEKS = 8
+archive_store = ArchiveStore(archive_path)
+# Journal des modifications (différences champ par champ + points de reprise)
+journal_dir = board_paths.journal
+
+# Une base restée dans un autre format n'est jamais remplacée silencieusement par une base vide
+legacy_db_path = os.path.join(os.path.dirname(db_path), "db.json")
+if db_path != legacy_db_path and os.path.exists(legacy_db_path) and not os.path.exists(db_path):
+    st.error(f"La base de ce planning est au format JSON. Convertissez-la : `python convert_db.py {legacy_db_path} {db_path}`")
+    profiler.finish()
+    st.stop()
+
+# Le modèle est partagé par toutes les sessions du processus (chargé une seule fois par planning)
+@st.cache_resource
+def get_board(path, archive_path, journal_dir, summary_path, storage_config):
+    """Retourne le modèle de planning partagé adossé au fichier TinyDB"""
+    board = BoardModel(open_db(path, storage_config).table("projects"), journal=Journal(journal_dir), summary_path=summary_path)
+    # Archiver automatiquement au démarrage du processus
+    board.archive_finished(ArchiveStore(archive_path), ARCHIVE_TASK_AGE_WEEKS)
+    return board
+
+# Classeurs Excel lus, partagés par les sessions (l'aperçu et la confirmation ne relisent pas le fichier)
+@st.cache_resource
+def get_import_cache():
+    """Retourne le cache des imports Excel du processus"""
+    return ParseCache()
+
+import_cache = get_import_cache()
+
+profiler.begin("db_load")
+board = get_board(db_path, archive_path, journal_dir, board_paths.summary, storage_config)
+
+# Chaque session ne garde que ses modifications en attente (copie sur écriture)
+if "overlay" not in st.session_state:
+    st.session_state.overlay = SessionOverlay()
+overlay = st.session_state.overlay
+
+# Afficher le message de la dernière action (conflit de sauvegarde, archivage)
+if "board_message" in st.session_state:
+    st.warning(st.session_state.pop("board_message"))
+
+# Indiquer si les dernières modifications sont déjà écrites sur disque
+def show_save_status():
+    save_status = board.save_status()
+    if save_status == "saving":
+        st.caption("⏳ Enregistrement…")
+    elif save_status == "error":
+        st.caption("❌ Échec de l'enregistrement, nouvelle tentative en cours")
+    else:
+        st.caption("✅ Enregistré")
 
-# ============================================================================
-# SECTION: DIAGRAMME DE GANTT COMBINÉ (SEM => MOIS)
-# ============================================================================
+# Tant qu'une écriture est en cours ou en échec, l'indicateur se rafraîchit seul (sans rejouer la page)
+st.fragment(show_save_status, run_every=1 if board.save_status() != "saved" else None)()
 
-# Importer plotly pour générer le diagramme de Gantt
-import plotly.express as px
-
-# Construire la liste des tâches pour le Gantt
-tasks = []
-
-# Ajouter les 12 semaines en tant que tâches
-for i, s in enumerate(donnees_semaines):
-    # Calculer les dates de début et fin réelles en datetime
-    start = datetime.strptime(s["Date de début"], "%d/%m/%Y")
-    end = datetime.strptime(s["Date de fin"], "%d/%m/%Y") + timedelta(days=1)  # rendre la fin inclusive
-    # Construire le label de la tâche : utiliser le numéro ISO de la semaine
-    week_num = start.isocalendar()[1]
-    label = f"S{week_num:02d} ({start.strftime('%d/%m')})"
-    # Ajouter la tâche avec le type 'Semaine' et un ordre pour conserver la séquence
-    tasks.append({"Task": label, "Start": start, "Finish": end, "Type": "Semaine", "Order": i})
-
-# Calculer la date de début pour les mois (après la 12ème semaine)
-date_mois_debut = date_debut + timedelta(weeks=12)
-
-# Générer les 6 mois et les ajouter après les semaines
-for i in range(6):
-    mois = (date_mois_debut.month + i - 1) % 12 + 1
-    annee = date_mois_debut.year + (date_mois_debut.month + i - 1) // 12
-    nombre_jours_mois = calendar.monthrange(annee, mois)[1]
-    start = datetime(annee, mois, 1)
-    end = datetime(annee, mois, nombre_jours_mois) + timedelta(days=1)
-    noms_mois = ["Janvier", "Février", "Mars", "Avril", "Mai", "Juin", "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"]
-    nom_mois = noms_mois[mois - 1]
-    label = f"{nom_mois} {annee}"
-    tasks.append({"Task": label, "Start": start, "Finish": end, "Type": "Mois", "Order": 12 + i})
-
-# Créer un DataFrame pour le Gantt
-df_gantt = pd.DataFrame(tasks)
-
-# Définir l'ordre des tâches pour que les semaines apparaissent en premier puis les mois
-ordre_taches = df_gantt.sort_values("Order")["Task"].tolist()
+# Versions vues lors du rendu précédent : base des modifications de ce passage
+seen_versions = st.session_state.get("seen_versions", {})
+snapshot = board.snapshot()
+st.session_state.seen_versions = snapshot.versions
+profiler.end("db_load")
 
-
-# Construire des colonnes catégorielles : 12 semaines puis 6 mois
-period_labels = df_gantt.sort_values("Order")["Task"].tolist()  # ordre des colonnes
-period_types = df_gantt.sort_values("Order")["Type"].tolist()
-period_starts = df_gantt.sort_values("Order")["Start"].tolist()
-period_ends = df_gantt.sort_values("Order")["Finish"].tolist()
-
-# Initialiser TinyDB pour la persistance des données
-db_path = os.path.join(os.path.dirname(__file__), "db.json")
-db = TinyDB(db_path)
-projects_table = db.table("projects")
-
-# Fonction pour charger les projets depuis la base de données
-def load_projects_from_db():
-    """Charge les projets depuis TinyDB et les reformate pour Streamlit"""
-    projects_data = projects_table.all()
-    projects = []
-    for proj_data in projects_data:
-        # Convertir les chaînes de date JSON en objets datetime
-        proj = proj_data.copy()
-        proj["start_date"] = datetime.fromisoformat(proj.get("start_date", datetime.now().isoformat()))
-        proj["end_date"] = datetime.fromisoformat(proj.get("end_date", datetime.now().isoformat()))
-        # Assurer que les tâches ont des dates au format datetime
-        if "tasks" in proj and proj["tasks"]:
-            for i, task in enumerate(proj["tasks"]):
-                if isinstance(task.get("due_date"), str):
-                    proj["tasks"][i] = task.copy()
-                    proj["tasks"][i]["due_date"] = datetime.fromisoformat(task["due_date"])
-        projects.append(proj)
-    return projects
-
-# Fonction pour sauvegarder les projets dans la base de données
-def save_projects_to_db(projects):
-    """Sauvegarde les projets dans TinyDB"""
-    projects_table.truncate()  # Vider la table
-    for proj in projects:
-        # Convertir les dates en ISO format pour le stockage JSON
-        proj_to_save = proj.copy()
-        proj_to_save["start_date"] = proj["start_date"].isoformat()
-        proj_to_save["end_date"] = proj["end_date"].isoformat()
-        # Convertir les dates des tâches aussi
-        if "tasks" in proj_to_save:
-            for task in proj_to_save["tasks"]:
-                if isinstance(task.get("due_date"), datetime):
-                    task["due_date"] = task["due_date"].isoformat()
-        projects_table.insert(proj_to_save)
-
-# Gérer les projets via `st.session_state` pour permettre l'ajout dynamique
-if "projects" not in st.session_state:
-    # Charger depuis la base de données
-    loaded_projects = load_projects_from_db()
-    st.session_state.projects = loaded_projects if loaded_projects else []
-    # Trier les projets par ordre alphabétique (A → Z) au démarrage
-    st.session_state.projects.sort(key=lambda p: p["name"].lower())
-
-# Fonction pour normaliser les dates des tâches
-def ensure_task_dates_are_datetime(projects):
-    """Vérifie et convertit les dates de tâches string en datetime"""
-    for project in projects:
-        if "tasks" in project and project["tasks"]:
-            for task in project["tasks"]:
-                if isinstance(task.get("due_date"), str):
-                    task["due_date"] = datetime.fromisoformat(task["due_date"])
-    return projects
-
-# S'assurer que toutes les dates de tâches sont des datetime
-st.session_state.projects = ensure_task_dates_are_datetime(st.session_state.projects)
+CONFLICT_MESSAGE = "⚠️ Ce projet a été modifié par un autre utilisateur entre-temps : vos changements n'ont pas été enregistrés, le planning a été rechargé."
 
 # Fonction pour sauvegarder après modification
 def sync_db():
-    """Synchronise les projets en session avec la base de données"""
-    save_projects_to_db(st.session_state.projects)
-
-
-# Fonction pour convertir une date absolue en indice de période
-def date_to_period_index(date, period_labels, period_starts, period_ends):
-    """Retourne l'indice de la période qui contient la date donnée"""
-    for idx in range(len(period_labels)):
-        if period_starts[idx] <= date <= period_ends[idx]:
-            return idx
-    # Si la date n'est pas dans les périodes, retourner l'indice le plus proche
-    if date < period_starts[0]:
-        return 0
-    else:
-        return len(period_labels) - 1
+    """Valide les modifications de la session dans le modèle partagé et la base de données"""
+    try:
+        with profiler.span("sync_db"):
+            overlay.commit(board)
+    except ConflictError:
+        st.session_state.board_message = CONFLICT_MESSAGE
 
-# Initialiser les filtres dans session_state s'ils n'existent pas
-if "filtered_projects" not in st.session_state:
-    st.session_state.filtered_projects = [p["name"] for p in st.session_state.projects]
+# Fonction pour choisir la clé d'un éditeur en grille (une clé par version du projet)
+def grid_editor_key(name, version):
+    """Retourne (clé de l'éditeur `name` pour la version affichée du projet, conflit).
 
-if "filtered_categories" not in st.session_state:
-    st.session_state.filtered_categories = ["Jalon", "Livrable", "Etude", "Prototype", "Map-Qual-Val", "Industrialisation"]
-
-if "filtered_statuses" not in st.session_state:
-    st.session_state.filtered_statuses = ["Pas démarré", "Dans les temps", "En retard", "Critique", "StandBy"]
-
-# Utiliser la liste de projets depuis le session state
-projects_full = st.session_state.projects
-
-# Helper: importer des tâches depuis un fichier Excel
-def parse_tasks_from_excel(uploaded_file, sheet_name="Model Tache"):
-    """Lit un fichier Excel et retourne une liste de tâches normalisées.
-    Colonnes attendues (en ordre): Nom, Catégorie, Date d'échéance, Progression.
-    - Ignore la première ligne (entêtes) via pandas (header=0)
-    - Si la catégorie n'est pas reconnue, utilise "Jalon"
-    - Si la date n'est pas valide, utilise la date du jour
-    - Si la progression n'est pas 0%/50%/100%, utilise 0%
+    Si le projet a changé alors que la grille rendue sous l'ancienne clé contient des
+    modifications non enregistrées, le conflit est signalé (elles ne sont pas reprises).
     """
-    allowed_categories = ["Jalon", "Livrable", "Etude", "Prototype", "Map-Qual-Val", "Industrialisation"]
-    allowed_progress = ["0%", "50%", "100%"]
+    keys = st.session_state.setdefault("grid_editor_keys", {})
+    key = f"{name}_{version}"
+    previous = keys.get(name)
+    conflict = False
+    if previous is not None and previous != key:
+        pending = st.session_state.get(previous) or {}
+        conflict = any(pending.get(part) for part in ("edited_rows", "added_rows", "deleted_rows"))
+        if conflict:
+            st.warning(CONFLICT_MESSAGE)
+        st.session_state.pop(previous, None)
+    keys[name] = key
+    return key, conflict
+
+# Fonction pour oublier la grille qui vient d'être enregistrée (la version suivante part d'une grille vierge)
+def forget_grid_editor(name):
+    st.session_state.get("grid_editor_keys", {}).pop(name, None)
 
-    try:
-        df = pd.read_excel(uploaded_file, sheet_name=sheet_name, engine="openpyxl")
-    except Exception as e:
-        st.error(f"Erreur de lecture du fichier Excel: {e}")
-        return [], {"category": 0, "due_date": 0, "progress": 0}
-
-    imported_tasks = []
-    corrections = {"category": 0, "due_date": 0, "progress": 0}
-    today = datetime.now()
-
-    # Parcourir les lignes de données (pandas considère la première ligne comme en-tête)
-    for _, row in df.iterrows():
-        # Lecture des colonnes par position
-        name = str(row.iloc[0]).strip() if pd.notna(row.iloc[0]) else ""
-        if name == "" or name.lower() in ("nan", "none"):
-            # Ignorer les lignes sans nom de tâche
-            continue
 
-        raw_category = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else ""
-        category = raw_category if raw_category in allowed_categories else "Jalon"
-        if category != raw_category:
-            corrections["category"] += 1
-
-        # Date d'échéance
-        raw_due = row.iloc[2] if len(row) > 2 else None
-        due_pd = pd.to_datetime(raw_due, errors="coerce")
-        if pd.isna(due_pd):
-            due_date = today
-            corrections["due_date"] += 1
-        else:
-            # Convertir en datetime natif
-            due_date = due_pd.to_pydatetime()
+# Initialiser les filtres dans session_state s'ils n'existent pas
+if "filtered_projects" not in st.session_state:
+    st.session_state.filtered_projects = [p["id"] for p in snapshot.projects]
 
-        # Progression
-        raw_progress = str(row.iloc[3]).strip() if (len(row) > 3 and pd.notna(row.iloc[3])) else ""
-        progress = raw_progress if raw_progress in allowed_progress else "0%"
-        if progress != raw_progress:
-            corrections["progress"] += 1
+if "filtered_categories" not in st.session_state:
+    st.session_state.filtered_categories = list(TASK_CATEGORIES)
 
-        imported_tasks.append({
-            "name": name,
-            "category": category,
-            "due_date": due_date,
-            "progress": progress,
-        })
+if "filtered_statuses" not in st.session_state:
+    st.session_state.filtered_statuses = list(PROJECT_STATUSES)
 
-    return imported_tasks, corrections
+# Utiliser la vue partagée du planning (lecture seule)
+projects_full = snapshot.projects
+project_index = snapshot.index
 
-# Construire un tableau pour afficher le planning avec couleurs de fond
-tableau_data = []
-tableau_styles = []  # Stocker les styles pour chaque ligne
-tableau_tooltips = []  # Stocker les tooltips pour chaque cellule
+# Retirer du filtre les projets supprimés par une autre session
+st.session_state.filtered_projects = [pid for pid in st.session_state.filtered_projects if pid in project_index]
 
 # Filtrer les projets selon la sélection stockée (projets et états)
-projects = [p for p in projects_full if p["name"] in st.session_state.filtered_projects and p.get("status", "Pas démarré") in st.session_state.filtered_statuses]
+filtered_project_ids = set(st.session_state.filtered_projects)
+projects = [p for p in projects_full if p["id"] in filtered_project_ids and p.get("status", "Pas démarré") in st.session_state.filtered_statuses]
 
-for p in projects:
-    # Ligne unique pour le projet (les tâches seront intégrées dans les cellules du projet)
-    row = {"Projet/Tâche": f"📋 {p['name']}"}
-    start_idx = date_to_period_index(p["start_date"], period_labels, period_starts, period_ends)
-    end_idx = date_to_period_index(p["end_date"], period_labels, period_starts, period_ends)
-    
-    row_styles = ["project"]  # Style pour la colonne Projet/Tâche
-    row_tooltips = [""]  # Tooltip vide pour la colonne Projet/Tâche
-    project_tooltip = f"{p['name']} • fin {p['end_date'].strftime('%d/%m/%Y')}"
-    tasks_per_period = [[] for _ in period_labels]  # Collecter les tâches par période pour le tooltip
-    
-    # Déterminer la classe CSS en fonction du statut du projet
-    project_status = p.get("status", "Pas démarré")
-    if project_status == "Pas démarré":
-        status_class = "not_started"
-    elif project_status == "En retard":
-        status_class = "overdue"
-    elif project_status == "Critique":
-        status_class = "critical"
-    elif project_status == "StandBy":
-        status_class = "standby"
-    else:  # "Dans les temps" or default
-        status_class = "active"
-
-    for idx, period in enumerate(period_labels):
-        if idx >= start_idx and idx <= end_idx:
-            row[period] = ""  # La couleur de fond suffit pour représenter la période active
-            # Appliquer la classe CSS basée sur le statut du projet
-            row_styles.append(status_class)
-            row_tooltips.append(project_tooltip)
-        else:
-            row[period] = ""
-            row_styles.append("inactive")
-            row_tooltips.append("")
-
-    # Ajouter les tâches directement dans la cellule de période du projet
-    # (sauf les tâches en retard ou filtrées par catégorie)
-    if "tasks" in p and len(p["tasks"]) > 0:
-        for task in p["tasks"]:
-            # Convertir la date de tâche si elle est en string
-            due_date = task["due_date"]
-            if isinstance(due_date, str):
-                due_date = datetime.fromisoformat(due_date)
-            
-            # Ne pas afficher les tâches en retard dans les colonnes
-            if due_date < datetime.now():
-                continue
-            
-            # Ne pas afficher les tâches terminées (100%)
-            if task.get("progress", "0%") == "100%":
-                continue
-            
-            # Filtrer par catégorie
-            task_category = task.get("category", "Jalon")
-            if task_category not in st.session_state.filtered_categories:
-                continue
-            
-            due_idx = date_to_period_index(due_date, period_labels, period_starts, period_ends)
-            target_period = period_labels[due_idx]
-            task_progress = task.get("progress", "0%")
-            task_category = task.get("category", "Jalon")
-            
-            # Créer le label avec icône et style différents selon la catégorie
-            if task_category == "Jalon":
-                # Utiliser un icône d'objectif pour les jalons et ajouter la classe CSS
-                task_label = f"<span class='task_milestone'>🎯 {escape(task['name'])}</span>"
-            elif task_category == "Livrable":
-                # Utiliser une icône de document pour les livrables
-                task_label = f"<span class='task_deliverable'>📄 {escape(task['name'])}</span>"
-            elif task_category == "Etude":
-                # Utiliser une icône de pile de livres pour les études
-                task_label = f"<span class='task_study'>📚 {escape(task['name'])}</span>"
-            elif task_category == "Prototype":
-                # Utiliser une icône d'outils pour les prototypes
-                task_label = f"<span class='task_prototype'>🔧 {escape(task['name'])}</span>"
-            elif task_category == "Map-Qual-Val":
-                # Utiliser une icône de tube à essai pour les tests
-                task_label = f"<span class='task_mapqualval'>🧪 {escape(task['name'])}</span>"
-            elif task_category == "Industrialisation":
-                # Utiliser une icône d'usine pour l'industrialisation
-                task_label = f"<span class='task_industrialisation'>🏭 {escape(task['name'])}</span>"
-            else:
-                # Icône losange pour les autres tâches
-                task_label = f"◆ {escape(task['name'])}"
-
-            existing = row.get(target_period, "")
-            if existing.strip():
-                row[target_period] = f"{existing}<br>{task_label}"
-            else:
-                row[target_period] = task_label
-
-            tasks_per_period[due_idx].append(task)
-
-    # Construire les tooltips finaux en combinant projet + tâches de la période
-    for idx, period in enumerate(period_labels):
-        if tasks_per_period[idx]:
-            task_lines = [
-                f"- {t['name']} (échéance {t['due_date'].strftime('%d/%m/%Y')}) [{t.get('progress', '0%')}]"
-                for t in tasks_per_period[idx]
-            ]
-            tooltip_full = f"{project_tooltip}\nTâches:\n" + "\n".join(task_lines)
-            row_tooltips[idx + 1] = tooltip_full
-    tableau_data.append(row)
-    tableau_styles.append(row_styles)
-    tableau_tooltips.append(row_tooltips)
-
-# Créer un DataFrame
-df_tableau = pd.DataFrame(tableau_data)
+# Construire le tableau du planning (une ligne par projet, tâches dans les cellules)
+with profiler.span("grid"):
+    grid = build_planning_grid(projects, st.session_state.filtered_categories, period_labels, period_starts, period_ends, schedule=snapshot.schedule)
+profiler.count("projects", len(projects_full))
+profiler.count("visible_projects", len(projects))
+profiler.count("tasks", sum(len(p["tasks"]) for p in projects_full) if profiler.enabled else 0)
 
 # Générer le HTML du tableau avec styles personnalisés
 st.subheader("Planning Gantt (Tableau)")
@@ -550,86 +429,40 @@ st.markdown("""
         color: #64b5f6;
         font-weight: bold;
     }
+    .task_critical_path {
+        text-decoration: underline wavy #ff1744;
+    }
+    .task_at_risk {
+        background-color: rgba(255, 152, 0, 0.3);
+        border-radius: 3px;
+    }
 </style>
 """, unsafe_allow_html=True)
 # Construire le HTML du tableau
-html_table = '<table>'
-
-# En-tête
-html_table += '<tr><th style="text-align: left;">Projet/Tâche</th><th style="text-align: left;">En retard</th>'
-for period in period_labels:
-    html_table += f'<th style="font-size: 11px;">{period}</th>'
-html_table += '</tr>'
-
-# Date actuelle pour détecter les tâches en retard
-today = datetime.now()
-
-# Lignes de données
-for row_idx, (_, row) in enumerate(df_tableau.iterrows()):
-    html_table += '<tr>'
-    # Première colonne (Projet/Tâche)
-    project_name = row['Projet/Tâche']
-    
-    # Colonne projet/tâche
-    if project_name.startswith('📋'):
-        html_table += f'<td class="row_label project_label">{project_name}</td>'
-    else:
-        html_table += f'<td class="row_label task_label">{project_name}</td>'
-    
-    # Deuxième colonne (En retard) - afficher les tâches en retard du projet
-    if project_name.startswith('📋'):
-        # C'est un projet - chercher ses tâches en retard (filtrées par catégorie)
-        project_full_name = project_name.replace('📋 ', '')
-        current_project = next((p for p in st.session_state.projects if p["name"] == project_full_name), None)
-        overdue_tasks = []
-        if current_project and "tasks" in current_project:
-            overdue_tasks = [
-                t for t in current_project["tasks"] 
-                if t["due_date"] < today 
-                and t.get("category", "Jalon") in st.session_state.filtered_categories
-                and t.get("progress", "0%") != "100%"
-            ]
-        
-        if overdue_tasks:
-            overdue_html = "<br>".join([f"⚠️ {escape(t['name'])}" for t in overdue_tasks])
-            # Créer un tooltip avec les détails des tâches en retard
-            tooltip_lines = [f"Tâches en retard pour {project_full_name}:"]
-            tooltip_lines.extend([
-                f"- {t['name']} (échéance {t['due_date'].strftime('%d/%m/%Y')}) [{t.get('progress', '0%')}]"
-                for t in overdue_tasks
-            ])
-            tooltip_text = "\n".join(tooltip_lines)
-            tooltip_attr = f' title="{escape(tooltip_text)}"'
-            html_table += f'<td style="text-align: left; color: #d32f2f;"{tooltip_attr}>{overdue_html}</td>'
-        else:
-            html_table += '<td style="text-align: left;"></td>'
-    else:
-        html_table += '<td style="text-align: left;"></td>'
-    
-    # Colonnes de périodes
-    for period in period_labels:
-        style_class = tableau_styles[row_idx][period_labels.index(period) + 1]
-        cell_content = row.get(period, "")
-        tooltip_text = tableau_tooltips[row_idx][period_labels.index(period) + 1]
-        tooltip_attr = f' title="{escape(tooltip_text)}"' if tooltip_text else ""
-        html_table += f'<td class="{style_class}"{tooltip_attr}>{cell_content}</td>'
-    
-    html_table += '</tr>'
-
-html_table += '</table>'
+with profiler.span("html"):
+    html_table = render_planning_html(grid, project_index, st.session_state.filtered_categories, period_labels)
+profiler.count("html_bytes", len(html_table.encode("utf-8")) if profiler.enabled else 0)
 
 # Afficher le tableau HTML
 st.markdown(html_table, unsafe_allow_html=True)
 
 # Section d'édition de projet - accessible en cliquant sur un projet dans le tableau
+profiler.begin("popovers")
 st.markdown("---")
 st.markdown("**✏️ Modifier un projet**")
 
-if len(st.session_state.projects) > 0:
-    filtered_projects = [p for p in st.session_state.projects if p["name"] in st.session_state.filtered_projects and p.get("status", "Pas démarré") in st.session_state.filtered_statuses]
+# Estimation (et non mesure) du nombre de widgets d'un popover de projet (paramètres, éditeur,
+# ajout, récurrence, import) : relevée sous le compteur "widgets_estimate"
+POPOVER_WIDGETS_ESTIMATE = 18
+
+if len(projects_full) > 0:
+    filtered_projects = [p for p in projects_full if p["id"] in filtered_project_ids and p.get("status", "Pas démarré") in st.session_state.filtered_statuses]
     if len(filtered_projects) > 0:
         # Afficher les popovers pour chaque projet
         for project in filtered_projects:
+            profiler.count("widgets_estimate", POPOVER_WIDGETS_ESTIMATE)
+            # Version affichée au passage précédent : sert de base aux modifications
+            base_version = seen_versions.get(project["id"], 0)
             with st.popover(f"📋 {project['name']}", use_container_width=True):
                 st.markdown(f"**Modifier : {project['name']}**")
                 
@@ -644,39 +477,36 @@ if len(st.session_state.projects) > 0:
                     new_project_name = st.text_input(
                         "Nom",
                         value=project["name"],
-                        key=f"edit_name_{project['name']}"
+                        key=f"edit_name_{project['id']}"
                     )
                     
                     new_start_period = st.selectbox(
                         "Début",
                         options=period_labels,
                         index=date_to_period_index(project["start_date"], period_labels, period_starts, period_ends),
-                        key=f"edit_start_{project['name']}"
+                        key=f"edit_start_{project['id']}"
                     )
                     
                     new_end_period = st.selectbox(
                         "Fin",
                         options=period_labels,
                         index=date_to_period_index(project["end_date"], period_labels, period_starts, period_ends),
-                        key=f"edit_end_{project['name']}"
+                        key=f"edit_end_{project['id']}"
                     )
                     
-                    status_options = ["Pas démarré", "Dans les temps", "En retard", "Critique", "StandBy"]
+                    status_options = PROJECT_STATUSES
                     current_status = project.get("status", "Pas démarré")
                     status_idx = status_options.index(current_status) if current_status in status_options else 0
                     new_status = st.selectbox(
                         "État du projet",
                         options=status_options,
                         index=status_idx,
-                        key=f"edit_status_{project['name']}"
+                        key=f"edit_status_{project['id']}"
                     )
                     
                     col_save, col_delete = st.columns(2)
                     with col_save:
-                        if st.button("💾 Sauvegarder", key=f"save_project_{project['name']}", use_container_width=True):
-                            # Trouver l'index du projet
-                            proj_idx = next(i for i, p in enumerate(st.session_state.projects) if p["name"] == project["name"])
-                            
+                        if st.button("💾 Sauvegarder", key=f"save_project_{project['id']}", use_container_width=True):
                             # Vérifier les dates
                             start_date = period_starts[period_labels.index(new_start_period)]
                             end_date = period_ends[period_labels.index(new_end_period)]
@@ -684,28 +514,25 @@ if len(st.session_state.projects) > 0:
                             if end_date < start_date:
                                 st.error("La période de fin doit être après la période de début.")
                             else:
-                                # Mettre à jour le projet
-                                st.session_state.projects[proj_idx]["name"] = new_project_name.strip()
-                                st.session_state.projects[proj_idx]["start_date"] = start_date
-                                st.session_state.projects[proj_idx]["end_date"] = end_date
-                                st.session_state.projects[proj_idx]["status"] = new_status
+                                # Mettre à jour la copie du projet (accès direct par identifiant)
+                                target_project = overlay.project(board, project["id"], base_version)
+                                target_project["name"] = new_project_name.strip()
+                                target_project["start_date"] = start_date
+                                target_project["end_date"] = end_date
+                                target_project["status"] = new_status
                                 
-                                # Trier les projets par ordre alphabétique
-                                st.session_state.projects.sort(key=lambda p: p["name"].lower())
                                 sync_db()  # Sauvegarder dans la DB
                                 
                                 st.success("Projet modifié.")
                                 st.rerun()
                     
                     with col_delete:
-                        if st.button("🗑️ Supprimer", key=f"delete_project_{project['name']}", use_container_width=True):
-                            proj_idx = next(i for i, p in enumerate(st.session_state.projects) if p["name"] == project["name"])
-                            deleted_name = st.session_state.projects[proj_idx]["name"]
-                            st.session_state.projects.pop(proj_idx)
+                        if st.button("🗑️ Supprimer", key=f"delete_project_{project['id']}", use_container_width=True):
+                            overlay.delete_project(project["id"], base_version)
                             
                             # Mettre à jour le filtre si le projet supprimé était sélectionné
-                            if deleted_name in st.session_state.filtered_projects:
-                                st.session_state.filtered_projects.remove(deleted_name)
+                            if project["id"] in st.session_state.filtered_projects:
+                                st.session_state.filtered_projects.remove(project["id"])
                             
                             sync_db()  # Sauvegarder dans la DB
                             st.success(f"Projet supprimé.")
@@ -716,86 +543,79 @@ if len(st.session_state.projects) > 0:
                     st.markdown("**Tâches**")
                     
                     # Afficher les tâches existantes
-                    proj_idx = next(i for i, p in enumerate(st.session_state.projects) if p["name"] == project["name"])
-                    tasks = st.session_state.projects[proj_idx].get("tasks", [])
+                    tasks = project.get("tasks", [])
                     
-                    # Affichage avec scrollable si beaucoup de tâches
-                    if len(tasks) > 0:
-                        task_container = st.container(border=True, height=250)
-                        with task_container:
-                            for task_idx, task in enumerate(tasks):
-                                # Trouver l'index de la période actuelle
-                                current_period_idx = date_to_period_index(task["due_date"], period_labels, period_starts, period_ends)
-                                current_progress = task.get('progress', '0%')
-                                progress_options = ["0%", "50%", "100%"]
-                                progress_idx = progress_options.index(current_progress) if current_progress in progress_options else 0
-                                
-                                # Catégorie de la tâche
-                                category_options = ["Jalon", "Livrable", "Etude", "Prototype", "Map-Qual-Val", "Industrialisation"]
-                                current_category = task.get('category', 'Jalon')
-                                category_idx = category_options.index(current_category) if current_category in category_options else 0
-                                
-                                # Tout sur une seule ligne avec colonnes
-                                col_name, col_category, col_due, col_progress, col_save, col_delete = st.columns([2.5, 1.5, 1.5, 1.2, 0.4, 0.4])
-                                
-                                with col_name:
-                                    task_name_edit = st.text_input(
-                                        f"T{task_idx+1}",
-                                        value=task['name'],
-                                        key=f"edit_task_name_{project['name']}_{task_idx}",
-                                        label_visibility="collapsed",
-                                        placeholder="Nom de la tâche"
-                                    )
-                                
-                                with col_category:
-                                    task_category_edit = st.selectbox(
-                                        "Catégorie",
-                                        options=category_options,
-                                        index=category_idx,
-                                        key=f"edit_task_category_{project['name']}_{task_idx}",
-                                        label_visibility="collapsed"
-                                    )
-                                
-                                with col_due:
-                                    task_due_date_edit = st.date_input(
-                                        "Dateîchance",
-                                        value=task["due_date"].date(),
-                                        key=f"edit_task_due_{project['name']}_{task_idx}",
-                                        label_visibility="collapsed"
-                                    )
-                                
-                                with col_progress:
-                                    task_progress_edit = st.selectbox(
-                                        "État",
-                                        options=progress_options,
-                                        index=progress_idx,
-                                        key=f"edit_task_progress_{project['name']}_{task_idx}",
-                                        label_visibility="collapsed"
-                                    )
-                                
-                                with col_save:
-                                    if st.button("💾", key=f"save_task_{project['name']}_{task_idx}", use_container_width=True, help="Sauvegarder"):
-                                        if task_name_edit.strip() == "":
-                                            st.error("Nom requis.")
-                                        else:
-                                            # Mettre à jour la tâche avec la date choisie
-                                            new_due_date = datetime.combine(task_due_date_edit, datetime.min.time())
-                                            st.session_state.projects[proj_idx]["tasks"][task_idx] = {
-                                                "name": task_name_edit.strip(),
-                                                "due_date": new_due_date,
-                                                "progress": task_progress_edit,
-                                                "category": task_category_edit
-                                            }
-                                            sync_db()  # Sauvegarder dans la DB
-                                            st.rerun()
-                                
-                                with col_delete:
-                                    if st.button("🗑️", key=f"delete_task_{project['name']}_{task_idx}", use_container_width=True, help="Supprimer"):
-                                        st.session_state.projects[proj_idx]["tasks"].pop(task_idx)
-                                        sync_db()  # Sauvegarder dans la DB
-                                        st.rerun()
-                    else:
-                        st.caption("Aucune tâche")
+                    # Éditeur en grille : toutes les modifications sont validées en une fois
+                    # (la version du projet dans la clé repart d'une grille vierge après chaque validation)
+                    task_editor = f"task_editor_{project['id']}"
+                    task_editor_key, task_conflict = grid_editor_key(task_editor, snapshot.versions.get(project['id'], 0))
+                    edited_tasks = st.data_editor(
+                        tasks_to_editor_frame(tasks),
+                        key=task_editor_key,
+                        num_rows="dynamic",
+                        hide_index=True,
+                        use_container_width=True,
+                        height=250,
+                        column_order=["Nom", "Catégorie", "Échéance", "Progression", "Récurrence"],
+                        disabled=["Récurrence"],
+                        column_config={
+                            "Nom": st.column_config.TextColumn("Nom", required=True),
+                            "Catégorie": st.column_config.SelectboxColumn("Catégorie", options=TASK_CATEGORIES, default="Jalon", required=True),
+                            "Échéance": st.column_config.DateColumn("Échéance", format="DD/MM/YYYY", default=(datetime.now() + timedelta(days=7)).date(), required=True),
+                            "Progression": st.column_config.SelectboxColumn("Progression", options=TASK_PROGRESS, default="0%", required=True),
+                        },
+                    )
+                    # En cas de conflit, la grille affichée ne contient plus les modifications : rien à enregistrer
+                    if st.button("💾 Enregistrer les tâches", key=f"save_tasks_{project['id']}", use_container_width=True) and not task_conflict:
+                        new_task_list, errors = tasks_from_editor_rows(tasks, edited_tasks.to_dict("records"))
+                        if errors:
+                            st.error("\n".join(errors))
+                        elif new_task_list == tasks:
+                            st.info("Aucune modification.")
+                        else:
+                            overlay.replace_tasks(board, project["id"], new_task_list, base_version)
+                            sync_db()  # Une seule sauvegarde pour toutes les lignes
+                            forget_grid_editor(task_editor)
+                            st.rerun()
+
+                    # Occurrences des séries récurrentes visibles dans la frise (seules les progressions modifiées sont stockées)
+                    recurring_tasks = [t for t in tasks if is_recurring(t)]
+                    if recurring_tasks:
+                        profiler.count("widgets_estimate", 2)
+                        occurrences = expand_tasks(recurring_tasks, period_starts[0], period_ends[-1])
+                        occurrence_editor = f"occurrence_editor_{project['id']}"
+                        occurrence_editor_key, occurrence_conflict = grid_editor_key(occurrence_editor, snapshot.versions.get(project['id'], 0))
+                        edited_occurrences = st.data_editor(
+                            pd.DataFrame(
+                                [{"series_id": o["series_id"], "Tâche": o["name"], "Date": o["due_date"].date(), "Progression": o["progress"]} for o in occurrences],
+                                columns=["series_id", "Tâche", "Date", "Progression"],
+                            ),
+                            key=occurrence_editor_key,
+                            hide_index=True,
+                            use_container_width=True,
+                            height=200,
+                            column_order=["Tâche", "Date", "Progression"],
+                            disabled=["Tâche", "Date"],
+                            column_config={
+                                "Date": st.column_config.DateColumn("Date", format="DD/MM/YYYY"),
+                                "Progression": st.column_config.SelectboxColumn("Progression", options=TASK_PROGRESS, required=True),
+                            },
+                        )
+                        if st.button("💾 Enregistrer les occurrences", key=f"save_occurrences_{project['id']}", use_container_width=True) and not occurrence_conflict:
+                            changed = [
+                                (occurrence, row["Progression"])
+                                for occurrence, row in zip(occurrences, edited_occurrences.to_dict("records"))
+                                if row["Progression"] != occurrence["progress"]
+                            ]
+                            if not changed:
+                                st.info("Aucune modification.")
+                            else:
+                                for occurrence, progress in changed:
+                                    series = overlay.task(board, project["id"], occurrence["series_id"], base_version)
+                                    set_occurrence_progress(series, occurrence["due_date"], progress)
+                                sync_db()
+                                forget_grid_editor(occurrence_editor)
+                                st.rerun()
                     
                     st.divider()
 
@@ -807,61 +627,99 @@ if len(st.session_state.projects) > 0:
                         # Utiliser un compteur pour réinitialiser le champ Nom après chaque création
                         if "task_reset_count" not in st.session_state:
                             st.session_state.task_reset_count = {}
-                        if project['name'] not in st.session_state.task_reset_count:
-                            st.session_state.task_reset_count[project['name']] = 0
+                        if project['id'] not in st.session_state.task_reset_count:
+                            st.session_state.task_reset_count[project['id']] = 0
                         
                         with task_name_col:
                             task_name = st.text_input(
                                 "Nom",
                                 value="",
-                                key=f"task_name_{project['name']}_{st.session_state.task_reset_count[project['name']]}",
+                                key=f"task_name_{project['id']}_{st.session_state.task_reset_count[project['id']]}",
                                 label_visibility="collapsed",
                                 placeholder="Nom"
                             )
                         with task_cat_col:
                             task_category = st.selectbox(
                                 "Catégorie",
-                                options=["Jalon", "Livrable", "Etude", "Prototype", "Map-Qual-Val", "Industrialisation"],
+                                options=TASK_CATEGORIES,
                                 index=0,
-                                key=f"task_category_{project['name']}",
+                                key=f"task_category_{project['id']}",
                                 label_visibility="collapsed"
                             )
                         with task_due_col:
                             task_due_date = st.date_input(
                                 "Date",
                                 value=(datetime.now() + timedelta(days=7)).date(),
-                                key=f"task_due_{project['name']}",
+                                key=f"task_due_{project['id']}",
                                 label_visibility="collapsed"
                             )
                         with task_prog_col:
                             task_progress = st.selectbox(
                                 "État",
-                                options=["0%", "50%", "100%"],
+                                options=TASK_PROGRESS,
                                 index=0,
-                                key=f"task_progress_{project['name']}",
+                                key=f"task_progress_{project['id']}",
                                 label_visibility="collapsed"
                             )
                         with task_add_col:
-                            if st.button("➕", key=f"add_task_{project['name']}", use_container_width=True, help="Ajouter"):
-                                if task_name.strip() == "":
-                                    st.error("Nom requis.")
-                                else:
-                                    due_date = datetime.combine(task_due_date, datetime.min.time())
-                                    if "tasks" not in st.session_state.projects[proj_idx]:
-                                        st.session_state.projects[proj_idx]["tasks"] = []
-                                    st.session_state.projects[proj_idx]["tasks"].append({
-                                        "name": task_name.strip(),
-                                        "due_date": due_date,
-                                        "progress": task_progress,
-                                        "category": task_category
-                                    })
-                                    sync_db()  # Sauvegarder dans la DB
-                                    # Incrémenter le compteur pour réinitialiser le champ Nom
-                                    st.session_state.task_reset_count[project['name']] += 1
-                                    st.success("Tâche créée !")
-                                    st.rerun()
-
-                        # Ligne 2: Import Excel (uploader + bouton)
+                            add_task_clicked = st.button("➕", key=f"add_task_{project['id']}", use_container_width=True, help="Ajouter")
+
+                        # Ligne 2: Récurrence de la tâche créée (type, intervalle, date de fin facultative)
+                        rec_col, interval_col, until_col = st.columns([2.2, 1.2, 2.4])
+                        with rec_col:
+                            task_recurrence = st.selectbox(
+                                "Récurrence",
+                                options=list(RECURRENCE_CHOICES),
+                                format_func=RECURRENCE_CHOICES.get,
+                                key=f"task_recurrence_{project['id']}",
+                                label_visibility="collapsed"
+                            )
+                        with interval_col:
+                            task_interval = st.number_input(
+                                "Intervalle",
+                                min_value=1,
+                                max_value=52,
+                                value=1,
+                                key=f"task_interval_{project['id']}",
+                                label_visibility="collapsed",
+                                help="Toutes les N semaines / N mois"
+                            )
+                        with until_col:
+                            task_until = st.date_input(
+                                "Jusqu'au",
+                                value=None,
+                                key=f"task_until_{project['id']}",
+                                label_visibility="collapsed",
+                                help="Date de fin de la série (facultative)"
+                            )
+
+                        if add_task_clicked:
+                            if task_name.strip() == "":
+                                st.error("Nom requis.")
+                            else:
+                                due_date = datetime.combine(task_due_date, datetime.min.time())
+                                new_task = {
+                                    "id": new_id(),
+                                    "name": task_name.strip(),
+                                    "due_date": due_date,
+                                    "progress": task_progress,
+                                    "category": task_category
+                                }
+                                if task_recurrence != "none":
+                                    new_task["recurrence"] = {
+                                        "freq": task_recurrence,
+                                        "interval": int(task_interval),
+                                        "day": task_due_date.day if task_recurrence == "monthly" else None,
+                                        "until": task_until.isoformat() if task_until else None,
+                                    }
+                                overlay.add_tasks(board, project["id"], [new_task], base_version)
+                                sync_db()  # Sauvegarder dans la DB
+                                # Incrémenter le compteur pour réinitialiser le champ Nom
+                                st.session_state.task_reset_count[project['id']] += 1
+                                st.success("Tâche créée !")
+                                st.rerun()
+
+                        # Ligne 3: Import Excel (uploader + bouton)
                         up_col, import_col = st.columns([3.2, 0.8])
                         with up_col:
                             uploaded_file = st.file_uploader(
@@ -869,24 +727,72 @@ if len(st.session_state.projects) > 0:
                                 type=["xlsx"],
                                 accept_multiple_files=False,
                                 label_visibility="collapsed",
-                                key=f"upload_excel_{project['name']}"
+                                key=f"upload_excel_{project['id']}"
                             )
                         with import_col:
-                            if st.button("📥", key=f"import_tasks_{project['name']}", use_container_width=True, help="Importer"):
+                            if st.button("🔍", key=f"import_tasks_{project['id']}", use_container_width=True, help="Prévisualiser l'import"):
                                 if uploaded_file is None:
                                     st.error("Veuillez sélectionner un fichier Excel.")
                                 else:
-                                    new_tasks, corrections = parse_tasks_from_excel(uploaded_file, sheet_name="Model Tache")
-                                    if len(new_tasks) == 0:
-                                        st.warning("Aucune tâche importée.")
-                                    else:
-                                        if "tasks" not in st.session_state.projects[proj_idx]:
-                                            st.session_state.projects[proj_idx]["tasks"] = []
-                                        st.session_state.projects[proj_idx]["tasks"].extend(new_tasks)
-                                        sync_db()  # Sauvegarder dans la DB
-                                        st.success(f"{len(new_tasks)} importées.")
+                                    # Le classeur est lu une seule fois (cache partagé par contenu)
+                                    try:
+                                        st.session_state[f"import_preview_{project['id']}"] = import_cache.parse(uploaded_file.getvalue(), "Model Tache")
+                                    except Exception as e:
+                                        st.error(f"Erreur de lecture du fichier Excel: {e}")
+
+                        # Aperçu de l'import : corrections et doublons signalés, lignes à importer cochées
+                        preview_key = st.session_state.get(f"import_preview_{project['id']}")
+                        if preview_key is not None:
+                            rows = import_cache.get(preview_key)
+                            if rows is None:
+                                st.warning("L'aperçu a expiré : prévisualisez à nouveau le fichier.")
+                                del st.session_state[f"import_preview_{project['id']}"]
+                            elif not rows:
+                                st.warning("Aucune tâche dans le fichier.")
+                                del st.session_state[f"import_preview_{project['id']}"]
+                            else:
+                                profiler.count("widgets_estimate", 3)
+                                preview = preview_frame(rows, tasks)
+                                edited_preview = st.data_editor(
+                                    preview,
+                                    key=f"import_preview_{project['id']}_{preview_key[0][:12]}",
+                                    hide_index=True,
+                                    use_container_width=True,
+                                    height=250,
+                                    disabled=["Corrections", "Doublon"],
+                                    column_config={
+                                        "Importer": st.column_config.CheckboxColumn("Importer"),
+                                        "Nom": st.column_config.TextColumn("Nom", required=True),
+                                        "Catégorie": st.column_config.SelectboxColumn("Catégorie", options=TASK_CATEGORIES, required=True),
+                                        "Échéance": st.column_config.DateColumn("Échéance", format="DD/MM/YYYY", required=True),
+                                        "Progression": st.column_config.SelectboxColumn("Progression", options=TASK_PROGRESS, required=True),
+                                    },
+                                )
+                                corrected_count = int((preview["Corrections"] != "").sum())
+                                duplicate_count = int((preview["Doublon"] != "").sum())
+                                st.caption(f"{len(preview)} ligne(s) lue(s), {corrected_count} corrigée(s), {duplicate_count} doublon(s) non cochés.")
+                                confirm_col, cancel_col = st.columns(2)
+                                with confirm_col:
+                                    if st.button("📥 Importer", key=f"confirm_import_{project['id']}", use_container_width=True):
+                                        selected_rows = [row for row in edited_preview.to_dict("records") if row["Importer"]]
+                                        new_tasks, errors = tasks_from_editor_rows([], selected_rows)
+                                        if errors:
+                                            st.error("\n".join(errors))
+                                        elif not new_tasks:
+                                            st.warning("Aucune tâche cochée.")
+                                        else:
+                                            overlay.add_tasks(board, project["id"], new_tasks, base_version)
+                                            sync_db()  # Une seule sauvegarde pour tout l'import
+                                            del st.session_state[f"import_preview_{project['id']}"]
+                                            st.success(f"{len(new_tasks)} importées.")
+                                            st.rerun()
+                                with cancel_col:
+                                    if st.button("Annuler", key=f"cancel_import_{project['id']}", use_container_width=True):
+                                        del st.session_state[f"import_preview_{project['id']}"]
                                         st.rerun()
 
+profiler.end("popovers")
+
 # Filtres à afficher (affichés sous le tableau)
 st.markdown("---")
 st.markdown("**Filtres**")
@@ -894,17 +800,18 @@ st.markdown("**Filtres**")
 col_filter1, col_filter2, col_filter3 = st.columns(3)
 
 with col_filter1:
-    all_project_names = [p["name"] for p in projects_full]
-    selected_project_names = st.multiselect(
+    all_project_ids = [p["id"] for p in projects_full]
+    selected_project_ids = st.multiselect(
         "Projets à afficher",
-        options=all_project_names,
+        options=all_project_ids,
         default=st.session_state.filtered_projects,
+        format_func=lambda pid: project_index[pid]["name"],
         help="Sélectionne un ou plusieurs projets pour les afficher dans le tableau",
         key="filter_projects_selector"
     )
 
 with col_filter2:
-    all_categories = ["Jalon", "Livrable", "Etude", "Prototype", "Map-Qual-Val", "Industrialisation"]
+    all_categories = TASK_CATEGORIES
     selected_categories = st.multiselect(
         "Catégories de tâches à afficher",
         options=all_categories,
@@ -914,7 +821,7 @@ with col_filter2:
     )
 
 with col_filter3:
-    all_statuses = ["Pas démarré", "Dans les temps", "En retard", "Critique", "StandBy"]
+    all_statuses = PROJECT_STATUSES
     selected_statuses = st.multiselect(
         "États des projets à afficher",
         options=all_statuses,
@@ -925,8 +832,8 @@ with col_filter3:
 
 # Mettre à jour les filtres en session_state et rafraîchir
 filter_changed = False
-if selected_project_names != st.session_state.filtered_projects:
-    st.session_state.filtered_projects = selected_project_names
+if selected_project_ids != st.session_state.filtered_projects:
+    st.session_state.filtered_projects = selected_project_ids
     filter_changed = True
 if selected_categories != st.session_state.filtered_categories:
     st.session_state.filtered_categories = selected_categories
@@ -956,29 +863,182 @@ with col_d:
         elif end_datetime < start_datetime:
             st.error("La date de fin doit être après la date de début.")
         else:
-            st.session_state.projects.append({"name": new_name.strip(), "start_date": start_datetime, "end_date": end_datetime, "status": "Pas démarré", "tasks": []})
-            # Trier les projets par ordre alphabétique (A → Z)
-            st.session_state.projects.sort(key=lambda p: p["name"].lower())
+            new_project = {"id": new_id(), "name": new_name.strip(), "start_date": start_datetime, "end_date": end_datetime, "status": "Pas démarré", "tasks": []}
+            overlay.add_project(new_project)
             sync_db()  # Sauvegarder dans la DB
             # Ajouter le nouveau projet au filtre pour qu'il s'affiche
-            st.session_state.filtered_projects.append(new_name.strip())
+            st.session_state.filtered_projects.append(new_project["id"])
             st.success(f"Projet '{new_name.strip()}' ajouté.")
             # Forcer la réexécution du script pour mettre à jour le graphique immédiatement
             st.rerun()
 
+# Dépendances entre tâches (liens fin → début, y compris entre projets) et chemin critique
+st.markdown("---")
+with st.expander("🔗 Dépendances et chemin critique"):
+    # Construit uniquement à la demande (parcourt toutes les tâches du planning)
+    if st.checkbox("Gérer les dépendances", key="show_dependencies") and projects_full:
+        linkable = {p["id"]: {t["id"]: t for t in p["tasks"] if not is_recurring(t)} for p in projects_full}
+        task_project = {tid: pid for pid, tasks in linkable.items() for tid in tasks}
+
+        def task_label(tid):
+            """Libellé « Projet • Tâche (échéance) » d'une tâche du planning"""
+            pid = task_project.get(tid)
+            if pid is None:
+                return f"Tâche supprimée ({tid[:8]})"
+            task = linkable[pid][tid]
+            return f"{project_index[pid]['name']} • {task['name']} ({task['due_date'].strftime('%d/%m/%Y')})"
+
+        project_ids = [p["id"] for p in projects_full]
+        col_succ, col_pred = st.columns(2)
+        with col_succ:
+            dep_project = st.selectbox("Projet", options=project_ids, format_func=lambda pid: project_index[pid]["name"], key="dep_project")
+            dep_task = st.selectbox("Tâche", options=list(linkable[dep_project]), format_func=task_label, key="dep_task")
+        with col_pred:
+            pred_project = st.selectbox("Dépend du projet", options=project_ids, format_func=lambda pid: project_index[pid]["name"], key="dep_pred_project")
+            pred_task = st.selectbox("Dépend de la tâche", options=list(linkable[pred_project]), format_func=task_label, key="dep_pred_task")
+
+        if st.button("🔗 Ajouter le lien", key="add_dependency", disabled=dep_task is None or pred_task is None):
+            current = linkable[dep_project][dep_task].get("depends_on") or []
+            if pred_task in current:
+                st.info("Ce lien existe déjà.")
+            elif board.would_create_cycle(dep_task, pred_task):
+                st.error("Ce lien créerait un cycle de dépendances.")
+            else:
+                target_task = overlay.task(board, dep_project, dep_task, seen_versions.get(dep_project, 0))
+                target_task["depends_on"] = list(current) + [pred_task]
+                sync_db()
+                st.rerun()
+
+        if dep_task is not None:
+            current = linkable[dep_project][dep_task].get("depends_on") or []
+            if current:
+                st.markdown("**Prédécesseurs de la tâche**")
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Tâche": task_label(tid),
+                        "Prévue le": snapshot.schedule[tid].forecast.strftime("%d/%m/%Y") if tid in snapshot.schedule else "",
+                        "Marge (j)": snapshot.schedule[tid].slack if tid in snapshot.schedule else None,
+                    }
+                    for tid in current
+                ]), hide_index=True, use_container_width=True)
+                removed_links = st.multiselect("Liens à retirer", options=current, format_func=task_label, key="dep_remove")
+                if st.button("✂️ Retirer", key="remove_dependency", disabled=not removed_links):
+                    target_task = overlay.task(board, dep_project, dep_task, seen_versions.get(dep_project, 0))
+                    target_task["depends_on"] = [tid for tid in current if tid not in removed_links]
+                    sync_db()
+                    st.rerun()
+
+        # Tâches à risque puis sur le chemin critique (marge croissante)
+        flagged = sorted(
+            ((tid, info) for tid, info in snapshot.schedule.items() if info.at_risk or info.critical),
+            key=lambda item: (not item[1].at_risk, item[1].slack),
+        )[:200]
+        st.markdown("**Tâches critiques et à risque**")
+        if flagged:
+            st.dataframe(pd.DataFrame([
+                {
+                    "Tâche": task_label(tid),
+                    "Prévue le": info.forecast.strftime("%d/%m/%Y"),
+                    "Marge (j)": info.slack,
+                    "État": "⏳ À risque" if info.at_risk else "Chemin critique",
+                }
+                for tid, info in flagged
+            ]), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aucune tâche critique ou à risque.")
+
 # Section de gestion de la base de données
 st.markdown("---")
 st.markdown("### ⚙️ Gestion de la base de données")
 
+with st.expander("🗄️ Archives"):
+    st.caption(f"Les projets terminés (date de fin passée, au moins une tâche et toutes à 100%) et les tâches terminées depuis plus de {ARCHIVE_TASK_AGE_WEEKS} semaines sont archivés au démarrage.")
+    if st.button("📦 Archiver maintenant", key="archive_now"):
+        archived_projects, archived_tasks = board.archive_finished(archive_store, ARCHIVE_TASK_AGE_WEEKS)
+        st.session_state.board_message = f"📦 {archived_projects} projet(s) et {archived_tasks} tâche(s) archivés."
+        st.rerun()
+    # Les archives ne sont lues que sur demande
+    if st.checkbox("Afficher les archives", key="show_archives"):
+        archived_project_docs, archived_task_docs = archive_store.load()
+        st.markdown("**Projets archivés**")
+        if archived_project_docs:
+            st.dataframe(pd.DataFrame([
+                {"Projet": doc["name"], "Début": doc["start_date"][:10], "Fin": doc["end_date"][:10], "Tâches": len(doc.get("tasks", [])), "Archivé le": doc["archived_at"][:10]}
+                for doc in archived_project_docs
+            ]), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aucun projet archivé")
+        st.markdown("**Tâches archivées**")
+        if archived_task_docs:
+            st.dataframe(pd.DataFrame([
+                {"Projet": doc["project_name"], "Tâche": doc["name"], "Catégorie": doc.get("category", "Jalon"), "Échéance": doc["due_date"][:10], "Archivé le": doc["archived_at"][:10]}
+                for doc in archived_task_docs
+            ]), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aucune tâche archivée")
+
+with st.expander("🕰️ Historique"):
+    # Le journal n'est lu que sur demande (le contenu d'un expander fermé est exécuté à chaque passage)
+    if st.checkbox("Afficher les dernières modifications", key="show_changes"):
+        history = board.history(limit=20)
+        if history:
+            st.dataframe(pd.DataFrame([
+                {
+                    "Date": datetime.fromisoformat(h["ts"]).strftime("%d/%m/%Y %H:%M:%S"),
+                    "Session": (h["session"] or "")[:8],
+                    "Changements": h["changes"],
+                    "Annulation": "↩️" if h["undo"] else "",
+                    "Archivage": "📦" if h["archive"] else "",
+                }
+                for h in history
+            ]), hide_index=True, use_container_width=True)
+        else:
+            st.caption("Aucune modification enregistrée")
+
+    col_undo_count, col_undo = st.columns([2, 1])
+    with col_undo_count:
+        undo_count = st.number_input("Modifications à annuler", min_value=1, max_value=20, value=1, key="undo_count", help="Les archivages (📦) ne sont pas annulés")
+    with col_undo:
+        if st.button("↩️ Annuler", key="undo_changes", use_container_width=True):
+            undone = board.undo(int(undo_count), overlay.session_id)
+            st.session_state.board_message = f"↩️ {undone} modification(s) annulée(s)."
+            st.rerun()
+
+    # Planning reconstruit à partir du journal (point de reprise + rejeu des différences)
+    history_date = st.date_input("Planning au", value=datetime.now().date(), key="history_date")
+    if st.checkbox("Afficher le planning à cette date", key="show_history"):
+        history_when = datetime.combine(history_date, datetime.max.time())
+        past_projects = board.projects_as_of(history_when)
+        if past_projects is None:
+            st.caption("Le journal ne remonte pas jusqu'à cette date.")
+        else:
+            past_grid = build_planning_grid(past_projects, st.session_state.filtered_categories, period_labels, period_starts, period_ends, now=history_when)
+            st.markdown(
+                render_planning_html(past_grid, {p["id"]: p for p in past_projects}, st.session_state.filtered_categories, period_labels, today=history_when),
+                unsafe_allow_html=True,
+            )
+
 with st.expander("🗑️ Supprimer toutes les données"):
     st.warning("⚠️ **Attention** : Cette action supprimera définitivement tous les projets et toutes les tâches de la base de données.")
     confirm_delete = st.checkbox("Je confirme vouloir supprimer toutes les données", key="confirm_db_delete")
     
     if st.button("🗑️ Effacer la base de données", type="primary", disabled=not confirm_delete):
-        # Vider la session state
-        st.session_state.projects = []
+        # Vider les modifications en attente et le filtre de la session
+        overlay.discard()
         st.session_state.filtered_projects = []
-        # Supprimer la base de données
-        projects_table.truncate()
+        # Supprimer la base de données (pour toutes les sessions)
+        board.clear()
         st.success("✅ Base de données effacée avec succès!")
         st.rerun()
+
+# Panneau de profilage (uniquement en mode debug) puis journal du passage
+if profiler.enabled:
+    with st.expander("⏱️ Profilage du passage", expanded=True):
+        profile_entry = profiler.record()
+        st.caption(f"Total : {profile_entry['total_ms']:.1f} ms")
+        st.dataframe(pd.DataFrame(
+            [{"Phase": name, "Durée (ms)": ms} for name, ms in profile_entry["spans_ms"].items()]
+        ), hide_index=True, use_container_width=True)
+        st.caption("Compteurs (widgets_estimate : estimation d'après le nombre de popovers, pas une mesure)")
+        st.json(profile_entry["counts"])
+profiler.finish()
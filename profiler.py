@@ -0,0 +1,130 @@
+"""Profilage léger d'un passage (rerun) du script Streamlit.
+
+Activé par le paramètre d'URL `?debug=1` ou la variable d'environnement
+`OBEYA_PROFILE=1`. Chaque phase nommée est chronométrée, les compteurs (projets,
+tâches, nombre estimé de widgets, taille du HTML) sont relevés, et une ligne JSON
+par passage est ajoutée au journal (`profile.jsonl` ou `OBEYA_PROFILE_LOG`). `?profile=1` ou
+`OBEYA_PROFILE_DUMP=<fichier>` enregistre en plus un profil cProfile (pstats)
+d'un seul passage. Désactivé, le profileur ne fait qu'un test de booléen par appel.
+"""
+import cProfile
+import json
+import os
+import time
+from datetime import datetime
+
+# Le profil cProfile demandé par variable d'environnement n'est pris qu'une fois par processus
+_env_dump_done = False
+
+
+class _NullSpan:
+    """Contexte vide partagé, utilisé quand le profilage est désactivé"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._profiler.begin(self._name)
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.end(self._name)
+        return False
+
+
+class RerunProfiler:
+    """Durées par phase et compteurs d'un passage du script"""
+
+    def __init__(self, enabled=False, log_path=None, dump_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.dump_path = dump_path
+        self.spans = {}  # nom de phase → secondes cumulées (ordre d'apparition)
+        self.counts = {}
+        self.finished = False
+        self._open = {}
+        self._started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._cprofile = None
+        if dump_path:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def span(self, name):
+        """Contexte chronométrant la phase `name`"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def begin(self, name):
+        """Démarre la phase `name` (pour les sections trop longues pour un `with`)"""
+        if self.enabled:
+            self._open[name] = time.perf_counter()
+
+    def end(self, name):
+        """Termine la phase `name` démarrée par `begin`"""
+        if self.enabled and name in self._open:
+            elapsed = time.perf_counter() - self._open.pop(name)
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed
+
+    def count(self, name, value=1):
+        """Ajoute `value` au compteur `name`"""
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def record(self):
+        """Retourne le relevé du passage (durées en millisecondes)"""
+        return {
+            "started_at": self._started_at.isoformat(timespec="milliseconds"),
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "spans_ms": {name: round(seconds * 1000, 3) for name, seconds in self.spans.items()},
+            "counts": dict(self.counts),
+        }
+
+    def finish(self, completed=True):
+        """Clôt le passage : journal JSON et profil cProfile éventuel (une seule fois).
+
+        `completed=False` signale un passage interrompu (par exemple par `st.rerun()`).
+        """
+        if self.finished:
+            return None
+        self.finished = True
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.dump_path)
+        if not self.enabled:
+            return None
+        # Fermer les phases interrompues pour qu'elles apparaissent dans le relevé
+        for name in list(self._open):
+            self.end(name)
+        entry = dict(self.record(), completed=completed)
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(entry) + "\n")
+        return entry
+
+
+def profiler_from_settings(query_params, environ, default_dir):
+    """Crée le profileur du passage à partir de l'URL et des variables d'environnement"""
+    global _env_dump_done
+    enabled = query_params.get("debug") == "1" or environ.get("OBEYA_PROFILE") == "1"
+    log_path = environ.get("OBEYA_PROFILE_LOG") or (os.path.join(default_dir, "profile.jsonl") if enabled else None)
+    dump_path = None
+    if query_params.get("profile") == "1":
+        dump_path = os.path.join(default_dir, f"profile-{datetime.now():%Y%m%d-%H%M%S}.pstats")
+    elif environ.get("OBEYA_PROFILE_DUMP") and not _env_dump_done:
+        dump_path = environ["OBEYA_PROFILE_DUMP"]
+        _env_dump_done = True
+    return RerunProfiler(enabled=enabled, log_path=log_path, dump_path=dump_path)
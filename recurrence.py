@@ -0,0 +1,127 @@
+"""Tâches récurrentes (revues hebdomadaires, comités mensuels...).
+
+Une tâche récurrente est stockée une seule fois, avec une règle `recurrence` :
+
+    {"freq": "weekly", "interval": 2, "until": "2027-06-30"}   # toutes les 2 semaines
+    {"freq": "monthly", "interval": 1, "day": 15, "until": None}  # le 15 de chaque mois
+
+La première occurrence est l'échéance (`due_date`) de la tâche. Les occurrences
+ne sont jamais stockées : elles sont calculées à l'affichage, uniquement pour la
+fenêtre de la frise. Seules les occurrences dont la progression a été modifiée
+sont enregistrées, dans `occurrences` (date ISO → progression).
+"""
+import calendar
+from datetime import datetime, timedelta
+
+# Libellés des types de récurrence proposés dans le formulaire
+RECURRENCE_CHOICES = {
+    "none": "Aucune",
+    "weekly": "Toutes les N semaines",
+    "monthly": "Chaque mois (même jour)",
+}
+# Progression d'une occurrence sans modification enregistrée
+DEFAULT_PROGRESS = "0%"
+
+
+# Fonction pour savoir si une tâche est une série récurrente
+def is_recurring(task):
+    """Retourne True si la tâche porte une règle de récurrence"""
+    return bool(task.get("recurrence"))
+
+
+def _until(rule):
+    until = rule.get("until")
+    return datetime.fromisoformat(until) + timedelta(days=1) if until else None
+
+
+def _month_occurrence(first, day, months):
+    # Occurrence située `months` mois après le mois de la première échéance (jour borné à la fin du mois)
+    year = first.year + (first.month - 1 + months) // 12
+    month = (first.month - 1 + months) % 12 + 1
+    return first.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+# Fonction pour calculer les dates d'une série dans une fenêtre
+def occurrence_dates(first, rule, window_start, window_end):
+    """Retourne les dates des occurrences comprises dans [window_start, window_end[.
+
+    Le coût dépend du nombre d'occurrences dans la fenêtre, pas de la longueur de la série.
+    """
+    interval = max(1, int(rule.get("interval") or 1))
+    until = _until(rule)
+    end = min(window_end, until) if until else window_end
+    start = max(first, window_start)
+    dates = []
+    if rule.get("freq") == "weekly":
+        step = timedelta(weeks=interval)
+        # Sauter directement à la première occurrence de la fenêtre
+        skipped = -(-(start - first) // step)
+        current = first + skipped * step
+        while current < end:
+            dates.append(current)
+            current += step
+    elif rule.get("freq") == "monthly":
+        day = int(rule.get("day") or first.day)
+        months = (start.year - first.year) * 12 + start.month - first.month
+        months = max(0, months - months % interval)
+        while True:
+            current = _month_occurrence(first, day, months)
+            if current >= end:
+                break
+            if current >= start:
+                dates.append(current)
+            months += interval
+    return dates
+
+
+# Fonction pour générer les occurrences affichables d'une liste de tâches
+def expand_tasks(tasks, window_start, window_end):
+    """Retourne les tâches avec chaque série remplacée par ses occurrences de la fenêtre.
+
+    Les tâches simples sont retournées telles quelles. Une occurrence a pour id
+    `<id de la série>@<date ISO>` et garde l'id de la série dans `series_id`.
+    """
+    expanded = []
+    for task in tasks:
+        if not is_recurring(task):
+            expanded.append(task)
+            continue
+        overrides = task.get("occurrences") or {}
+        for due_date in occurrence_dates(task["due_date"], task["recurrence"], window_start, window_end):
+            key = due_date.date().isoformat()
+            expanded.append({
+                "id": f"{task['id']}@{key}",
+                "series_id": task["id"],
+                "name": task["name"],
+                "category": task.get("category", "Jalon"),
+                "due_date": due_date,
+                "progress": overrides.get(key, DEFAULT_PROGRESS),
+            })
+    return expanded
+
+
+# Fonction pour enregistrer la progression d'une occurrence
+def set_occurrence_progress(task, due_date, progress):
+    """Modifie la progression d'une occurrence ; seules les valeurs non par défaut sont gardées"""
+    overrides = dict(task.get("occurrences") or {})
+    key = due_date.date().isoformat()
+    if progress == DEFAULT_PROGRESS:
+        overrides.pop(key, None)
+    else:
+        overrides[key] = progress
+    task["occurrences"] = overrides
+
+
+# Fonction pour décrire une règle de récurrence en clair
+def describe_recurrence(rule):
+    """Retourne une description courte de la règle (chaîne vide si pas de récurrence)"""
+    if not rule:
+        return ""
+    interval = max(1, int(rule.get("interval") or 1))
+    if rule.get("freq") == "weekly":
+        text = "Chaque semaine" if interval == 1 else f"Toutes les {interval} semaines"
+    else:
+        text = f"Le {rule.get('day')} de chaque mois" if interval == 1 else f"Le {rule.get('day')}, tous les {interval} mois"
+    if rule.get("until"):
+        text += f" jusqu'au {datetime.fromisoformat(rule['until']).strftime('%d/%m/%Y')}"
+    return text
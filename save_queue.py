@@ -0,0 +1,133 @@
+"""File d'écriture différée de la base de données.
+
+Les sessions déposent leurs changements (document par projet) dans une file bornée.
+Un thread d'écriture regroupe les changements d'un même projet, attend une courte
+pause sans nouvelle modification (debounce) puis écrit le tout en une seule fois.
+Le disque sort ainsi du chemin critique des clics.
+
+En cas d'échec, l'écriture est retentée ; à l'arrêt, les tentatives sont bornées dans
+le temps et les changements qui n'ont pas pu être écrits sont signalés par une
+erreur dans les logs (jamais abandonnés en silence).
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+# Marqueur de fin envoyé au thread d'écriture
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class SaveQueue:
+    """Écrivain en arrière-plan avec regroupement des changements par clé"""
+
+    def __init__(self, write_fn, debounce=0.3, max_delay=2.0, maxsize=256):
+        """`write_fn(changes)` reçoit un dict clé → valeur (None = suppression)"""
+        self._write_fn = write_fn
+        self._debounce = debounce
+        self._max_delay = max_delay
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pending = {}
+        self._outstanding = 0  # dépôts pas encore écrits
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.last_error = None
+        self.writes = 0
+        self._close_deadline = None  # limite des nouvelles tentatives après close()
+        self._thread = threading.Thread(target=self._run, name="obeya-save-queue", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, changes):
+        """Met des changements en file (bloque si la file est pleine)"""
+        with self._lock:
+            self._outstanding += 1
+        self._queue.put(dict(changes))
+
+    def status(self):
+        """Retourne "error" (dernière écriture en échec, nouvelle tentative prévue), "saving" ou "saved" pour l'affichage"""
+        if self.last_error:
+            return "error"
+        with self._lock:
+            if self._outstanding or self._pending:
+                return "saving"
+        return "saved"
+
+    def flush(self, timeout=None):
+        """Attend que tous les changements déposés soient écrits.
+        Retourne False si `timeout` expire avant (par exemple si l'écriture échoue en boucle).
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._outstanding and not self._pending, timeout)
+
+    def close(self, timeout=10.0):
+        """Écrit les changements restants puis arrête le thread (appelé à l'arrêt).
+        Un échec est retenté pendant `timeout` secondes au plus. Retourne True si tout est écrit.
+        """
+        if self._thread.is_alive():
+            self._close_deadline = time.monotonic() + timeout
+            self._queue.put(_STOP)
+            self._thread.join(timeout + self._max_delay)
+        with self._lock:
+            unsaved = len(self._pending)
+        if unsaved or self._thread.is_alive():
+            logger.error("Arrêt : %d document(s) du planning non écrit(s) sur disque (%s)", unsaved, self.last_error)
+            return False
+        return True
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = []
+            item = self._queue.get()
+            if item is _STOP:
+                stop = True
+            else:
+                batch.append(item)
+                # Attendre une pause sans nouveau changement (plafonnée par max_delay)
+                deadline = time.monotonic() + self._max_delay
+                while True:
+                    timeout = min(self._debounce, deadline - time.monotonic())
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+            self._write_batch(batch, retry=not stop)
+        # Arrêt : retenter les changements restants jusqu'à l'échéance fixée par close()
+        while self._pending and self._close_deadline is not None and time.monotonic() < self._close_deadline:
+            time.sleep(self._debounce)
+            self._write_batch([], retry=False)
+
+    def _write_batch(self, batch, retry=True):
+        # Regrouper : la dernière valeur d'une clé remplace les précédentes
+        with self._lock:
+            for item in batch:
+                self._pending.update(item)
+            changes = dict(self._pending)
+        failed = False
+        if changes:
+            try:
+                self._write_fn(changes)
+                self.writes += 1
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                failed = True
+        with self._idle:
+            self._outstanding -= len(batch)
+            if not failed:
+                self._pending = {}
+            elif retry and self._queue.empty():
+                # Conserver les changements et programmer une nouvelle tentative
+                self._outstanding += 1
+                self._queue.put_nowait({})
+            self._idle.notify_all()
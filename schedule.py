@@ -0,0 +1,211 @@
+"""Dépendances entre tâches et chemin critique.
+
+Une tâche peut dépendre d'autres tâches, y compris d'autres projets (liens « fin →
+début ») : `task["depends_on"]` contient les identifiants de ses prédécesseurs.
+Les tâches n'ont qu'une échéance ; la durée d'une tâche est donc l'écart entre son
+échéance et la plus tardive de celles de ses prédécesseurs. Le moteur calcule :
+
+- la date prévue : une tâche ne peut finir avant ses prédécesseurs + sa durée, et
+  une tâche en retard non terminée est prévue au plus tôt aujourd'hui ;
+- la fin de chaque projet : la plus tardive des dates prévues de ses dernières
+  tâches liées (sans successeur) ;
+- la date au plus tard (passe arrière depuis la fin du projet de chaque dernière
+  tâche) et la marge = au plus tard − prévue.
+
+Une tâche liée est « critique » si sa marge est nulle (seule la chaîne qui fixe la
+fin du projet l'est) et « à risque » si sa date prévue dépasse son échéance. Après
+une modification, seuls les successeurs des tâches touchées (passe avant) et leurs
+ancêtres (passe arrière) sont recalculés, ainsi que les chaînes des projets dont la
+fin a bougé.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# Résultat par tâche liée : date prévue, marge en jours, critique, à risque
+ScheduleInfo = namedtuple("ScheduleInfo", ["forecast", "slack", "critical", "at_risk"])
+
+
+class ScheduleEngine:
+    """Graphe des dépendances du planning, recalculé de façon incrémentale"""
+
+    def __init__(self):
+        self._project = {}  # id tâche → id projet
+        self._due = {}  # id tâche → échéance
+        self._done = {}  # id tâche → terminée (100%)
+        self._preds = {}  # id tâche → prédécesseurs déclarés (éventuellement absents du planning)
+        self._succs = {}  # id tâche → successeurs déclarés
+        self._tasks_by_project = {}  # id projet → ids des tâches
+        self._forecast = {}
+        self._latest = {}
+        self._finish = {}  # id projet → fin prévue (dernières tâches liées)
+        self._dirty_projects = set()  # projets modifiés depuis le dernier calcul (fin à revoir)
+        self.infos = {}  # id tâche → ScheduleInfo (tâches liées uniquement)
+        self.cycles = set()  # tâches d'un cycle ou en aval d'un cycle (ignorées par le calcul)
+        self._lost_successor = set()  # prédécesseurs d'un lien retiré : date au plus tard à revoir
+        self.today = None
+
+    def rebuild(self, projects, now=None):
+        """Reconstruit tout le graphe à partir des projets"""
+        self.__init__()
+        self.today = (now or datetime.now()).date()
+        for proj in projects:
+            self._set_project(proj["id"], proj)
+        self._recompute(set(self._due))
+
+    def refresh(self, now=None):
+        """Recalcule tout si la date du jour a changé (tâches en retard). Retourne True si recalculé"""
+        today = (now or datetime.now()).date()
+        if today == self.today:
+            return False
+        self.today = today
+        self._recompute(set(self._due))
+        return True
+
+    def update(self, changes):
+        """Applique les projets modifiés (`id projet → projet`, None = supprimé) et recalcule le sous-graphe touché"""
+        changed = set()
+        for pid, proj in changes.items():
+            changed |= self._set_project(pid, proj)
+        if changed:
+            self._recompute(changed)
+
+    def _set_project(self, pid, proj):
+        # Retourne les tâches dont l'échéance, l'avancement ou les liens ont changé
+        changed = set()
+        tasks = {}
+        if proj is not None:
+            tasks = {t["id"]: t for t in proj.get("tasks", []) if not t.get("recurrence")}
+        for tid in self._tasks_by_project.get(pid, set()) - set(tasks):
+            changed.add(tid)
+            changed |= self._succs.get(tid, set())
+            self._remove_task(tid)
+        for tid, task in tasks.items():
+            preds = tuple(dict.fromkeys(task.get("depends_on") or ()))  # sans doublons
+            done = task.get("progress", "0%") == "100%"
+            if self._due.get(tid) == task["due_date"] and self._done.get(tid) == done and self._preds.get(tid) == preds:
+                continue
+            self._remove_task(tid)
+            self._project[tid] = pid
+            self._due[tid] = task["due_date"]
+            self._done[tid] = done
+            self._preds[tid] = preds
+            for pred in preds:
+                self._succs.setdefault(pred, set()).add(tid)
+            changed.add(tid)
+        if tasks:
+            self._tasks_by_project[pid] = set(tasks)
+        else:
+            self._tasks_by_project.pop(pid, None)
+        if changed:
+            self._dirty_projects.add(pid)
+        return changed
+
+    def _remove_task(self, tid):
+        for pred in self._preds.pop(tid, ()):
+            self._lost_successor.add(pred)
+            succs = self._succs.get(pred)
+            if succs is not None:
+                succs.discard(tid)
+                if not succs:
+                    del self._succs[pred]
+        self._project.pop(tid, None)
+        self._due.pop(tid, None)
+        self._done.pop(tid, None)
+        self._forecast.pop(tid, None)
+        self._latest.pop(tid, None)
+        self.infos.pop(tid, None)
+        self.cycles.discard(tid)
+
+    def _live_preds(self, tid):
+        return [p for p in self._preds.get(tid, ()) if p in self._due]
+
+    def _live_succs(self, tid):
+        return [s for s in self._succs.get(tid, ()) if s in self._due]
+
+    def _closure(self, seeds, neighbours):
+        # Tâches atteignables depuis `seeds` (comprises) en suivant `neighbours`
+        seen = {t for t in seeds if t in self._due}
+        stack = list(seen)
+        while stack:
+            for nxt in neighbours(stack.pop()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return seen
+
+    def _ordered(self, nodes, inputs, outputs):
+        # Tri topologique (Kahn) restreint à `nodes` ; les tâches restantes sont dans un cycle
+        pending = {t: sum(1 for p in inputs(t) if p in nodes) for t in nodes}
+        ready = [t for t, count in pending.items() if count == 0]
+        order = []
+        while ready:
+            tid = ready.pop()
+            order.append(tid)
+            for nxt in outputs(tid):
+                if nxt in pending:
+                    pending[nxt] -= 1
+                    if pending[nxt] == 0:
+                        ready.append(nxt)
+        return order, {t for t, count in pending.items() if count > 0}
+
+    def _duration(self, tid, preds):
+        return max(self._due[tid] - max(self._due[p] for p in preds), timedelta(0))
+
+    def _recompute(self, changed):
+        today = datetime.combine(self.today or datetime.now().date(), datetime.min.time())
+        # Passe avant : dates prévues des tâches touchées et de tous leurs successeurs
+        forward = self._closure(changed, self._live_succs)
+        order, cyclic = self._ordered(forward, self._live_preds, self._live_succs)
+        for tid in cyclic:
+            self._forecast[tid] = self._due[tid]
+        for tid in order:
+            due = self._due[tid]
+            forecast = due if self._done[tid] else max(due, today)
+            preds = [p for p in self._live_preds(tid) if p not in cyclic]
+            if preds and not self._done[tid]:
+                forecast = max(forecast, max(self._forecast[p] for p in preds) + self._duration(tid, preds))
+            self._forecast[tid] = forecast
+        # Passe arrière : la date au plus tard dépend des successeurs et de leurs durées
+        seeds = set(changed) | self._lost_successor
+        for tid in changed:
+            seeds.update(self._live_succs(tid))
+        # Fin des projets dont une dernière tâche a pu changer (date prévue, liens, suppression)
+        cycles = (self.cycles - forward) | cyclic
+        touched = forward | self._lost_successor | {p for tid in changed if tid in self._due for p in self._live_preds(tid)}
+        projects = {self._project[tid] for tid in touched if tid in self._project} | self._dirty_projects
+        self._lost_successor = set()
+        self._dirty_projects = set()
+        for pid in projects:
+            last = [t for t in self._tasks_by_project.get(pid, ()) if not self._live_succs(t)]
+            finish = max((self._forecast[t] for t in last if t not in cycles and self._live_preds(t)), default=None)
+            if finish != self._finish.get(pid):
+                if finish is None:
+                    self._finish.pop(pid, None)
+                else:
+                    self._finish[pid] = finish
+                # Toutes les dernières tâches du projet partent de la nouvelle fin
+                seeds.update(last)
+        backward = self._closure(seeds, self._live_preds)
+        order_back, cyclic_back = self._ordered(backward, self._live_succs, self._live_preds)
+        for tid in cyclic_back:
+            self._latest[tid] = self._due[tid]
+        for tid in order_back:
+            succs = [s for s in self._live_succs(tid) if s not in cyclic_back]
+            if succs:
+                self._latest[tid] = min(self._latest[s] - self._duration(s, self._live_preds(s)) for s in succs)
+            else:
+                self._latest[tid] = self._finish.get(self._project[tid], self._due[tid])
+        self.cycles = (self.cycles - forward - backward) | cyclic | cyclic_back
+        for tid in forward | backward:
+            if tid in self.cycles or not (self._live_preds(tid) or self._live_succs(tid)):
+                self.infos.pop(tid, None)
+                continue
+            forecast = self._forecast[tid]
+            slack = (self._latest[tid] - forecast).days
+            self.infos[tid] = ScheduleInfo(forecast, slack, slack <= 0 and not self._done[tid], forecast > self._due[tid])
+
+    def would_create_cycle(self, task_id, predecessor_id):
+        """Indique si le lien `predecessor_id` → `task_id` fermerait un cycle"""
+        if task_id == predecessor_id:
+            return True
+        return predecessor_id in self._closure({task_id}, lambda t: self._succs.get(t, ()))
@@ -0,0 +1,211 @@
+"""Stockage TinyDB du planning.
+
+`AtomicJSONStorage` remplace le `JSONStorage` par défaut : chaque écriture passe par
+un fichier temporaire puis `os.replace`, si bien qu'un arrêt brutal laisse toujours
+l'ancienne ou la nouvelle version complète de `db.json`, jamais un fichier tronqué.
+
+La base des plannings est configurable (variables d'environnement) :
+
+- `OBEYA_DB_FORMAT` : `json` (défaut), `orjson` (JSON plus rapide, paquet `orjson`)
+  ou `msgpack` (binaire, paquet `msgpack`) ;
+- `OBEYA_DB_COMPRESSION` : `gzip` pour compresser le fichier ;
+- `OBEYA_DB_CACHE` : `0` pour désactiver le `CachingMiddleware` (activé par défaut :
+  la base n'est lue qu'une fois, chaque sauvegarde est écrite par un `flush` explicite).
+
+Le nom du fichier suit le format (`db.json`, `db.msgpack`, suffixe `.gz`) ;
+`convert_db.py` convertit une base d'un format à l'autre.
+"""
+import gzip
+import json
+import os
+import tempfile
+from collections import namedtuple
+
+from tinydb import TinyDB
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import Storage
+
+try:
+    import orjson
+except ImportError:  # dépendance facultative
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # dépendance facultative
+    msgpack = None
+
+SERIALIZERS = ("json", "orjson", "msgpack")
+COMPRESSIONS = (None, "gzip")
+
+# Format de la base : sérialiseur, compression, cache en mémoire (CachingMiddleware)
+StorageConfig = namedtuple("StorageConfig", ["serializer", "compression", "caching"])
+
+
+def _atomic_write(path, payload):
+    # Écrit `payload` (octets) dans un fichier temporaire puis le renomme sur `path`
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".db-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Ne jamais laisser de fichier temporaire orphelin
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class AtomicJSONStorage(Storage):
+    """Stockage JSON écrit de façon atomique (fichier temporaire + os.replace)"""
+
+    def __init__(self, path, encoding="utf-8", **kwargs):
+        super().__init__()
+        self.path = path
+        self.encoding = encoding
+        self.kwargs = kwargs
+
+    def read(self):
+        # Fichier absent ou vide : TinyDB initialise une base vide
+        try:
+            with open(self.path, encoding=self.encoding) as handle:
+                content = handle.read()
+        except FileNotFoundError:
+            return None
+        return json.loads(content) if content.strip() else None
+
+    def write(self, data):
+        _atomic_write(self.path, json.dumps(data, **self.kwargs).encode(self.encoding))
+
+
+# Fonction pour écrire un gros document JSON sans monopoliser l'interpréteur
+def write_json_by_entry(path, data, key):
+    """Écrit `data` en JSON de façon atomique, le dictionnaire `data[key]` entrée par entrée.
+    Chaque appel à json.dumps reste court : écrit depuis un thread d'arrière-plan, le
+    document ne bloque pas les autres threads (GIL) pendant tout l'encodage.
+    """
+    head = {k: v for k, v in data.items() if k != key}
+    chunks = [json.dumps(head)[:-1]]
+    chunks.append(f'{", " if head else ""}{json.dumps(key)}: {{')
+    chunks.append(", ".join(f"{json.dumps(k)}: {json.dumps(v)}" for k, v in data[key].items()))
+    chunks.append("}}")
+    _atomic_write(path, "".join(chunks).encode("utf-8"))
+
+
+def _dumps(serializer, data):
+    if serializer == "orjson":
+        return orjson.dumps(data)
+    if serializer == "msgpack":
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data).encode("utf-8")
+
+
+def _loads(serializer, payload):
+    if serializer == "orjson":
+        return orjson.loads(payload)
+    if serializer == "msgpack":
+        return msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+def _check_serializer(serializer):
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Format de base inconnu : {serializer} (choix : {', '.join(SERIALIZERS)})")
+    if serializer == "orjson" and orjson is None:
+        raise ValueError("Le format orjson demande le paquet orjson (pip install orjson)")
+    if serializer == "msgpack" and msgpack is None:
+        raise ValueError("Le format msgpack demande le paquet msgpack (pip install msgpack)")
+
+
+class AtomicFileStorage(Storage):
+    """Stockage atomique avec sérialiseur (json, orjson, msgpack) et compression gzip au choix"""
+
+    def __init__(self, path, serializer="json", compression=None):
+        super().__init__()
+        _check_serializer(serializer)
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Compression inconnue : {compression}")
+        self.path = path
+        self.serializer = serializer
+        self.compression = compression
+
+    def read(self):
+        # Fichier absent ou vide : TinyDB initialise une base vide
+        try:
+            with open(self.path, "rb") as handle:
+                payload = handle.read()
+        except FileNotFoundError:
+            return None
+        if not payload.strip():
+            return None
+        if self.compression == "gzip":
+            payload = gzip.decompress(payload)
+        return _loads(self.serializer, payload)
+
+    def write(self, data):
+        payload = _dumps(self.serializer, data)
+        if self.compression == "gzip":
+            # Niveau 1 : ~4x plus petit que le JSON brut, deux à trois fois plus rapide que le niveau 6
+            payload = gzip.compress(payload, compresslevel=1)
+        _atomic_write(self.path, payload)
+
+
+# Fonction pour lire le format de la base dans les variables d'environnement
+def storage_config_from_env(environ):
+    """Retourne la configuration du stockage (OBEYA_DB_FORMAT, OBEYA_DB_COMPRESSION, OBEYA_DB_CACHE)"""
+    serializer = environ.get("OBEYA_DB_FORMAT", "json") or "json"
+    compression = environ.get("OBEYA_DB_COMPRESSION") or None
+    if compression == "none":
+        compression = None
+    _check_serializer(serializer)
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compression inconnue : {compression} (choix : gzip)")
+    return StorageConfig(serializer, compression, environ.get("OBEYA_DB_CACHE", "1") != "0")
+
+
+# Fonction pour nommer le fichier de base selon son format
+def db_filename(config, stem="db"):
+    """Retourne le nom du fichier de base : db.json, db.msgpack, avec .gz si compressé"""
+    name = f"{stem}.msgpack" if config.serializer == "msgpack" else f"{stem}.json"
+    return name + ".gz" if config.compression == "gzip" else name
+
+
+# Fonction pour déduire le format d'une base de son nom de fichier
+def config_from_path(path, caching=False):
+    """Retourne la configuration correspondant à l'extension (le JSON est lu avec orjson si disponible)"""
+    compression = "gzip" if path.endswith(".gz") else None
+    base = path[:-3] if compression else path
+    if base.endswith(".msgpack"):
+        serializer = "msgpack"
+    elif base.endswith(".json"):
+        serializer = "orjson" if orjson is not None else "json"
+    else:
+        raise ValueError(f"Extension non reconnue : {path} (.json, .msgpack, éventuellement .gz)")
+    return StorageConfig(serializer, compression, caching)
+
+
+# Fonction pour ouvrir la base TinyDB avec le format configuré
+def open_db(path, config):
+    """Ouvre la base TinyDB ; avec le cache, les écritures restent en mémoire jusqu'à `flush_storage`"""
+    storage = CachingMiddleware(AtomicFileStorage) if config.caching else AtomicFileStorage
+    return TinyDB(path, storage=storage, serializer=config.serializer, compression=config.compression)
+
+
+# Fonction pour écrire sur disque les données gardées par le CachingMiddleware
+def flush_storage(storage):
+    """Écrit le cache du stockage s'il en a un (sans effet sur un stockage direct)"""
+    if isinstance(storage, CachingMiddleware):
+        storage.flush()
+
+
+# Fonction pour convertir une base d'un format à l'autre
+def convert_db(source, target):
+    """Convertit la base `source` vers `target` (formats déduits des extensions). Retourne le nombre de tables"""
+    source_config = config_from_path(source)
+    target_config = config_from_path(target)
+    data = AtomicFileStorage(source, source_config.serializer, source_config.compression).read() or {}
+    AtomicFileStorage(target, target_config.serializer, target_config.compression).write(data)
+    return len(data)
@@ -0,0 +1,91 @@
+"""Tests du moteur de planification (schedule.py) : `python -m pytest -q`"""
+import copy
+import random
+from datetime import datetime, timedelta
+
+from schedule import ScheduleEngine
+
+NOW = datetime(2026, 10, 19)
+
+
+def _task(task_id, days, depends_on=(), progress="0%"):
+    return {"id": task_id, "due_date": NOW + timedelta(days=days), "progress": progress, "depends_on": list(depends_on)}
+
+
+def _engine(tasks):
+    engine = ScheduleEngine()
+    engine.rebuild([{"id": "p", "tasks": tasks}], NOW)
+    return engine
+
+
+def test_only_the_chain_driving_the_project_finish_is_critical():
+    engine = _engine([_task("A", 5), _task("B", 10, ["A"]), _task("C", 5), _task("D", 30, ["C"])])
+    infos = engine.infos
+    assert infos["C"].critical and infos["D"].critical
+    assert not infos["A"].critical and not infos["B"].critical
+    assert infos["A"].slack == infos["B"].slack == 20
+
+
+def test_single_chain_on_time_drives_the_finish():
+    infos = _engine([_task("A", 5), _task("B", 10, ["A"])]).infos
+    assert infos["A"].slack == infos["B"].slack == 0
+    assert infos["A"].critical and infos["B"].critical
+
+
+def test_done_tasks_are_never_critical():
+    infos = _engine([_task("A", 5, progress="100%"), _task("B", 10, ["A"])]).infos
+    assert not infos["A"].critical and infos["B"].critical
+
+
+def _random_edit(rng, projects, engine, counter):
+    # Modifie un projet au hasard ; retourne (id projet, document ou None si supprimé)
+    pid = rng.choice(sorted(projects))
+    proj = projects[pid]
+    tasks = proj["tasks"]
+    all_ids = [t["id"] for p in projects.values() for t in p["tasks"]]
+    action = rng.choice(["due", "progress", "add", "delete", "link", "unlink", "drop_project"])
+    if action == "drop_project" and len(projects) > 2:
+        del projects[pid]
+        return pid, None
+    if action == "add" or not tasks:
+        counter[0] += 1
+        tasks.append(_task(f"t{counter[0]}", rng.randint(-20, 60)))
+    elif action == "due":
+        rng.choice(tasks)["due_date"] = NOW + timedelta(days=rng.randint(-20, 60))
+    elif action == "progress":
+        rng.choice(tasks)["progress"] = rng.choice(["0%", "50%", "100%"])
+    elif action == "delete":
+        tasks.remove(rng.choice(tasks))
+    elif action == "link":
+        task = rng.choice(tasks)
+        pred = rng.choice(all_ids)
+        if not engine.would_create_cycle(task["id"], pred) and pred not in task["depends_on"]:
+            task["depends_on"].append(pred)
+    elif action == "unlink":
+        linked = [t for t in tasks if t["depends_on"]]
+        if linked:
+            task = rng.choice(linked)
+            task["depends_on"].remove(rng.choice(task["depends_on"]))
+    return pid, copy.deepcopy(proj)
+
+
+def test_incremental_update_matches_rebuild():
+    for seed in range(40):
+        rng = random.Random(seed)
+        counter = [0]
+        projects = {}
+        for p in range(4):
+            tasks = []
+            for _ in range(6):
+                counter[0] += 1
+                tasks.append(_task(f"t{counter[0]}", rng.randint(-20, 60)))
+            projects[f"p{p}"] = {"id": f"p{p}", "tasks": tasks}
+        engine = ScheduleEngine()
+        engine.rebuild(copy.deepcopy(list(projects.values())), NOW)
+        for step in range(60):
+            pid, doc = _random_edit(rng, projects, engine, counter)
+            engine.update({pid: doc})
+            expected = ScheduleEngine()
+            expected.rebuild(copy.deepcopy(list(projects.values())), NOW)
+            assert engine.infos == expected.infos, (seed, step)
+            assert engine.cycles == expected.cycles, (seed, step)
@@ -0,0 +1,115 @@
+"""Plannings nommés (un par équipe ou département).
+
+Chaque planning a son propre dossier et ses propres fichiers (base, archives,
+journal) : ouvrir un planning ne charge que ses données. Le planning « Principal »
+reste à la racine (fichiers historiques `db.json`, `archive.json`, `journal/`),
+les autres sont dans `boards/<identifiant>/` avec un fichier `board.json` (nom).
+
+À chaque écriture, un résumé du planning (`summary.json`, quelques chiffres) est
+enregistré à côté de la base : la vue portefeuille ne lit que ces résumés, jamais
+les tâches des autres plannings.
+"""
+import os
+import re
+import unicodedata
+from collections import namedtuple
+from datetime import datetime
+
+from storage import AtomicJSONStorage
+
+DEFAULT_BOARD = "principal"
+DEFAULT_BOARD_NAME = "Principal"
+
+# Fichiers d'un planning
+BoardPaths = namedtuple("BoardPaths", ["db", "archive", "journal", "summary"])
+
+
+# Fonction pour calculer le résumé d'un planning (vue portefeuille)
+def board_summary(projects, schedule=None, now=None):
+    """Retourne les chiffres clés du planning : projets, tâches, retards, états, chemin critique"""
+    now = now or datetime.now()
+    schedule = schedule or {}
+    statuses = {}
+    tasks = done = overdue = 0
+    next_due = None
+    for proj in projects:
+        status = proj.get("status", "Pas démarré")
+        statuses[status] = statuses.get(status, 0) + 1
+        for task in proj.get("tasks", []):
+            tasks += 1
+            # Les séries récurrentes comptent pour une tâche, sans échéance propre
+            if task.get("recurrence"):
+                continue
+            if task.get("progress", "0%") == "100%":
+                done += 1
+            elif task["due_date"] < now:
+                overdue += 1
+            elif next_due is None or task["due_date"] < next_due:
+                next_due = task["due_date"]
+    return {
+        "projects": len(projects),
+        "tasks": tasks,
+        "tasks_done": done,
+        "tasks_overdue": overdue,
+        "statuses": statuses,
+        "critical": sum(1 for info in schedule.values() if info.critical),
+        "at_risk": sum(1 for info in schedule.values() if info.at_risk),
+        "next_due": next_due.isoformat() if next_due else None,
+        "updated_at": now.isoformat(timespec="seconds"),
+    }
+
+
+def _slugify(name):
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+class Workspaces:
+    """Registre des plannings : un dossier par planning, ouvert seulement à la demande"""
+
+    def __init__(self, root, db_name="db.json"):
+        self.root = root
+        self.boards_dir = os.path.join(root, "boards")
+        self.db_name = db_name  # nom du fichier de base, selon le format configuré
+
+    def _folder(self, slug):
+        return self.root if slug == DEFAULT_BOARD else os.path.join(self.boards_dir, slug)
+
+    def paths(self, slug):
+        """Retourne les chemins des fichiers du planning"""
+        folder = self._folder(slug)
+        return BoardPaths(
+            os.path.join(folder, self.db_name),
+            os.path.join(folder, "archive.json"),
+            os.path.join(folder, "journal"),
+            os.path.join(folder, "summary.json"),
+        )
+
+    def boards(self):
+        """Retourne {identifiant: nom} des plannings, le planning principal en premier"""
+        boards = {DEFAULT_BOARD: DEFAULT_BOARD_NAME}
+        if os.path.isdir(self.boards_dir):
+            for slug in sorted(os.listdir(self.boards_dir)):
+                meta = AtomicJSONStorage(os.path.join(self.boards_dir, slug, "board.json")).read()
+                if meta:
+                    boards[slug] = meta.get("name", slug)
+        return boards
+
+    def create(self, name):
+        """Crée un planning vide et retourne son identifiant"""
+        base = _slugify(name) or "planning"
+        slug = base
+        suffix = 2
+        while slug == DEFAULT_BOARD or os.path.exists(self._folder(slug)):
+            slug = f"{base}-{suffix}"
+            suffix += 1
+        os.makedirs(self._folder(slug))
+        AtomicJSONStorage(os.path.join(self._folder(slug), "board.json")).write({
+            "name": name,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        })
+        return slug
+
+    def summaries(self):
+        """Retourne {identifiant: résumé ou None} sans ouvrir les bases des plannings"""
+        return {slug: AtomicJSONStorage(self.paths(slug).summary).read() for slug in self.boards()}